@@ -3,8 +3,16 @@
 """
 from flask import Flask
 from models import db
+from services.cache_service import response_cache
+from services.data_version import data_version, LOCATIONS, FORECASTS, FORECAST_DELETES
+from services.forecast_store import forecast_store
+from services.spatial_index import spatial_index
+from services.board_service import board_snapshots
+from services.db_backend import resolve_database_uri, build_engine_options, ensure_indexes
 from views.main import main_bp
 from views.api import api_bp
+from views.compression import compression, static_assets
+from views.profiling import profiler, admin_bp
 from config import config
 import os
 import logging
@@ -22,9 +30,10 @@ def create_app(config_name='default'):
     # アプリケーションのルートディレクトリを取得
     app_root = os.path.dirname(os.path.abspath(__file__))
     
-    # データベースパスを絶対パスに変更
-    db_path = os.path.join(app_root, 'data', 'weather.db')
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    # DATABASE_URLを反映（SQLiteの相対パスはアプリルート基準の絶対パスに変更）
+    database_uri = resolve_database_uri(app.config.get('SQLALCHEMY_DATABASE_URI'), app_root)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(database_uri, app.config)
     
     # ログ設定
     logging.basicConfig(
@@ -35,9 +44,17 @@ def create_app(config_name='default'):
     # データベース初期化
     db.init_app(app)
     
+    # レスポンスキャッシュ初期化
+    response_cache.init_app(app)
+    
     # ブループリント登録
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp)
+    app.register_blueprint(admin_bp)
+    
+    # レスポンス圧縮と指紋付き静的ファイル配信
+    compression.init_app(app)
+    static_assets.init_app(app)
     
     # データベースとテーブル作成
     with app.app_context():
@@ -45,6 +62,10 @@ def create_app(config_name='default'):
         data_dir = os.path.join(app_root, 'data')
         os.makedirs(data_dir, exist_ok=True)
         db.create_all()
+        ensure_indexes()
+        
+        # batch.py や別ワーカーによる更新の検知
+        data_version.init_app(app)
         
         # プリセット地域の追加
         from services.data_service import DataService
@@ -61,6 +82,29 @@ def create_app(config_name='default'):
                     country_code=preset.get('country_code', 'JP')
                 )
                 app.logger.info(f"プリセット地域を追加: {preset['name']}")
+        
+        # 読み込み用インメモリストア（有効時のみDBから読み込み）
+        forecast_store.init_app(app)
+        
+        # 座標による近傍・範囲検索用のインデックス
+        spatial_index.init_app(app)
+        
+        # 他プロセスの更新を検知したら、ストア・インデックスに反映してからレスポンスキャッシュを破棄
+        # （反映は data_version のバックグラウンドスレッドで行う）
+        if forecast_store.enabled:
+            data_version.on_change(LOCATIONS, forecast_store.load_locations)
+            data_version.on_change(FORECASTS, forecast_store.refresh_forecasts)
+            data_version.on_change(FORECAST_DELETES, forecast_store.load)
+        # 座標は地域にのみあるため、空間インデックスは地域の変更時だけ作り直す
+        data_version.on_change(LOCATIONS, spatial_index.rebuild)
+        for scope in (LOCATIONS, FORECASTS, FORECAST_DELETES):
+            data_version.on_change(scope, response_cache.clear)
+        
+        # 明日の天気ボード（未作成なら作成）
+        board_snapshots.init_app(app)
+        
+        # リクエストプロファイリング（PROFILING_ENABLED時のみ）
+        profiler.init_app(app, db.engine)
     
     return app
 
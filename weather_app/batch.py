@@ -0,0 +1,288 @@
+"""
+バッチ処理 - 天気データの一括更新とエクスポート
+
+サーバーを起動せずに、指定地域の天気データを並列に取得・保存して
+CSV / JSON / Parquet に書き出す。途中で失敗しても --resume で
+未完了の地域から再開できる。
+
+使い方:
+    python batch.py --output out/forecast.csv
+    python batch.py --ids 1,2,3 --format json --output out/forecast.json
+    python batch.py --favorites --output out/forecast.parquet --resume
+"""
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from app import create_app
+from config import Config
+from models.location import Location
+from services.board_service import board_snapshots
+from services.data_service import DataService
+from services.export_service import SUPPORTED_FORMATS, export_to_file
+from services.weather_service import WeatherService, WeatherAPIError
+
+logger = logging.getLogger('batch')
+
+
+class Checkpoint:
+    """完了済み・失敗した地域を記録する再開用ファイル"""
+
+    def __init__(self, path: str, resume: bool):
+        self.path = path
+        self.done: set = set()
+        self.failed: Dict[int, str] = {}
+        if resume and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.done = set(state.get('done', []))
+            logger.info(f"前回の実行から再開します: 完了済み{len(self.done)}件")
+
+    def mark_done(self, location_ids: List[int]):
+        """保存が完了した地域を記録"""
+        self.done.update(location_ids)
+        for location_id in location_ids:
+            self.failed.pop(location_id, None)
+        self.save()
+
+    def mark_failed(self, location_id: int, message: str):
+        """失敗した地域を記録"""
+        self.failed[location_id] = message
+
+    def save(self):
+        """一時ファイル経由で置き換え、書き込み途中の中断でも壊れないようにする"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({
+                'updated_at': datetime.utcnow().isoformat(),
+                'done': sorted(self.done),
+                'failed': {str(k): v for k, v in self.failed.items()}
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """全地域が完了したら再開用ファイルを削除し、次回の --resume で全件を取得させる"""
+        self.done.clear()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def select_locations(args) -> List[Tuple[int, str, str]]:
+    """
+    対象地域を取得（アプリケーションコンテキスト内で呼ぶ）
+
+    Returns:
+        (地域ID, 地域名, 国コード) のリスト
+    """
+    query = Location.query
+    if args.ids:
+        query = query.filter(Location.id.in_(args.ids))
+    if args.names:
+        query = query.filter(Location.name.in_(args.names))
+    if args.favorites:
+        query = query.filter(Location.is_favorite.is_(True))
+    rows = query.with_entities(Location.id, Location.name, Location.country_code).order_by(Location.id)
+    return [(location_id, name, country_code or 'JP') for location_id, name, country_code in rows]
+
+
+def run_refresh(targets: List[Tuple[int, str, str]], weather_service: WeatherService,
+                checkpoint: Checkpoint, workers: int, processes: int, chunk_size: int) -> Dict:
+    """
+    天気データを並列に取得・解析して保存
+
+    上流APIの呼び出しはスレッドプール、レスポンスの解析はプロセスプールで行い、
+    取得の途中でも解析済みの分を chunk_size 件ごとに一括保存して
+    チェックポイントを更新する。途中で例外が起きた場合も、取得・解析を
+    終えた分を保存してから例外を送出する。
+
+    Returns:
+        処理件数と所要時間の統計
+    """
+    stats = {'fetched': 0, 'saved': 0, 'failed': 0, 'fetch_seconds': 0.0}
+    pending: List[Dict] = []
+    parse_futures: Dict = {}
+
+    def fetch(target):
+        location_id, name, country_code = target
+        started = time.perf_counter()
+        raw = weather_service.get_forecast_response(name, country_code)
+        return location_id, raw, time.perf_counter() - started
+
+    def flush():
+        if not pending:
+            return
+        stats['saved'] += DataService.save_weather_forecasts(pending)
+        checkpoint.mark_done([item['location_id'] for item in pending])
+        pending.clear()
+
+    def add_parsed(location_id: int, weather_data: Dict):
+        pending.append({'location_id': location_id, 'weather_data': weather_data})
+        if len(pending) >= chunk_size:
+            flush()
+
+    def collect_parsed(wait: bool):
+        """解析が終わった分を保存待ちに移す（wait=True の場合は全件の完了を待つ）"""
+        finished = as_completed(list(parse_futures)) if wait else [f for f in list(parse_futures) if f.done()]
+        for future in finished:
+            location_id, name = parse_futures.pop(future)
+            try:
+                weather_data = future.result()
+            except Exception as e:
+                stats['failed'] += 1
+                checkpoint.mark_failed(location_id, f"{name}: 解析エラー: {e}")
+                continue
+            add_parsed(location_id, weather_data)
+
+    parser = ProcessPoolExecutor(max_workers=processes) if processes > 0 else None
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as fetcher:
+            fetch_futures = {fetcher.submit(fetch, target): target for target in targets}
+            try:
+                for future in as_completed(fetch_futures):
+                    location_id, name, _ = fetch_futures[future]
+                    try:
+                        _, raw, elapsed = future.result()
+                    except WeatherAPIError as e:
+                        stats['failed'] += 1
+                        checkpoint.mark_failed(location_id, f"{name}: {e}")
+                        continue
+                    stats['fetched'] += 1
+                    stats['fetch_seconds'] += elapsed
+                    if parser:
+                        parse_futures[parser.submit(WeatherService.extract_tomorrow_data, raw)] = (location_id, name)
+                        collect_parsed(wait=False)
+                    else:
+                        add_parsed(location_id, WeatherService.extract_tomorrow_data(raw))
+            except BaseException:
+                # 中断時も取得済みの分は保存し、--resume で再取得しないようにする
+                for future in fetch_futures:
+                    future.cancel()
+                try:
+                    collect_parsed(wait=True)
+                    flush()
+                except Exception as e:
+                    logger.error(f"中断時の保存に失敗しました: {e}")
+                raise
+        collect_parsed(wait=True)
+        flush()
+    finally:
+        if parser:
+            parser.shutdown()
+        checkpoint.save()
+    return stats
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    """コマンドライン引数を解析"""
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='天気データを一括更新してファイルに書き出す')
+    parser.add_argument('--ids', type=lambda v: [int(x) for x in v.split(',') if x.strip()],
+                        help='対象の地域ID（カンマ区切り）。省略時は全地域')
+    parser.add_argument('--names', type=lambda v: [x.strip() for x in v.split(',') if x.strip()],
+                        help='対象の地域名（カンマ区切り）')
+    parser.add_argument('--favorites', action='store_true', help='お気に入りの地域のみ')
+    parser.add_argument('--output', required=True, help='出力ファイルのパス')
+    parser.add_argument('--format', choices=SUPPORTED_FORMATS,
+                        help='出力形式（省略時は拡張子から判定）')
+    parser.add_argument('--workers', type=int, default=min(32, cpu_count * 4),
+                        help='上流APIの同時取得数')
+    parser.add_argument('--processes', type=int, default=cpu_count,
+                        help='解析用プロセス数（0で同一プロセス）')
+    parser.add_argument('--chunk-size', type=int, default=100, help='一括保存の件数')
+    parser.add_argument('--state', help='再開用ファイルのパス（省略時は出力先.state.json）')
+    parser.add_argument('--resume', action='store_true', help='前回完了した地域をスキップ')
+    parser.add_argument('--skip-refresh', action='store_true', help='取得せず保存済みデータを書き出す')
+    parser.add_argument('--env', default=os.getenv('FLASK_ENV', 'development'), help='設定名')
+    parser.add_argument('--verbose', action='store_true', help='地域ごとのログを表示')
+    args = parser.parse_args(argv)
+
+    if not args.format:
+        ext = os.path.splitext(args.output)[1].lstrip('.').lower()
+        if ext not in SUPPORTED_FORMATS:
+            parser.error('--format を指定するか、出力ファイルの拡張子を csv / json / parquet にしてください')
+        args.format = ext
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error('Parquet出力には pyarrow パッケージが必要です (pip install pyarrow)')
+    args.state = args.state or f"{args.output}.state.json"
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """バッチ処理のエントリーポイント"""
+    args = parse_args(argv)
+    app = create_app(args.env)
+    if not args.verbose:
+        # 地域ごとのINFOログは数千件になるため抑制
+        logging.getLogger('services').setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    started = time.perf_counter()
+    with app.app_context():
+        targets = select_locations(args)
+        if not targets:
+            logger.error("対象の地域がありません")
+            return 1
+
+        checkpoint = Checkpoint(args.state, args.resume)
+        remaining = [target for target in targets if target[0] not in checkpoint.done]
+        stats = {'fetched': 0, 'saved': 0, 'failed': 0, 'fetch_seconds': 0.0}
+        if not args.skip_refresh and remaining:
+            logger.info(f"天気データを取得します: {len(remaining)}件（スキップ{len(targets) - len(remaining)}件）")
+            weather_service = WeatherService.from_config(Config)
+            stats = run_refresh(
+                remaining, weather_service, checkpoint,
+                workers=max(1, args.workers), processes=max(0, args.processes),
+                chunk_size=max(1, args.chunk_size)
+            )
+            hedge = weather_service.hedge.stats()
+            if hedge['enabled']:
+                logger.info(
+                    f"ヘッジ: {hedge['hedged']}件送信（採用{hedge['hedge_wins']}件, 予算超過{hedge['budget_denied']}件）, "
+                    f"取得レイテンシ p50 {hedge['latency_ms']['p50']}ms / p99 {hedge['latency_ms']['p99']}ms "
+                    f"（上流単体 p99 {hedge['upstream_p99_ms']}ms）"
+                )
+
+        if stats['saved']:
+            # 定期実行の更新後に天気ボードの事前生成ファイルを作り直す
+            board_snapshots.build()
+        
+        forecasts = DataService.get_weather_forecasts_by_locations([target[0] for target in targets])
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        export_to_file(forecasts, args.output, args.format)
+
+    elapsed = time.perf_counter() - started
+    processed = stats['fetched'] + stats['failed']
+    logger.info(
+        f"完了: 対象{len(targets)}件 / 保存{stats['saved']}件 / 失敗{stats['failed']}件 / "
+        f"出力{len(forecasts)}件 -> {args.output}"
+    )
+    logger.info(
+        f"所要時間 {elapsed:.1f}秒, スループット {processed / elapsed if elapsed else 0:.1f}件/秒, "
+        f"平均取得時間 {stats['fetch_seconds'] / stats['fetched'] * 1000 if stats['fetched'] else 0:.0f}ms"
+    )
+    for message in checkpoint.failed.values():
+        logger.warning(f"失敗: {message}")
+    if checkpoint.failed:
+        logger.warning("失敗した地域は --resume を付けて再実行すると再取得します")
+        return 1
+    if not args.skip_refresh:
+        checkpoint.clear()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
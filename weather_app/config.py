@@ -16,6 +16,13 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///data/weather.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # コネクションプール設定（SQLite以外で有効）
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # 秒
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))  # 秒
+    
     # OpenWeatherMap API設定
     OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY', '')
     OPENWEATHER_BASE_URL = 'https://api.openweathermap.org/data/2.5'
@@ -25,6 +32,76 @@ class Config:
     API_TIMEOUT = 10
     CACHE_DURATION = 1800  # 30分
     
+    # 上流APIのサーキットブレーカー設定（エンドポイントごと）
+    CIRCUIT_BREAKER_OPTIONS = {
+        'failure_threshold': float(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 0.5)),  # 失敗率
+        'min_calls': 3,  # 判定に必要な最小呼び出し数
+        'window': 60,  # 集計窓（秒）
+        'open_duration': int(os.getenv('CIRCUIT_OPEN_DURATION', 30)),  # 遮断時間（秒）
+        'half_open_max_calls': 1,  # 復旧確認の試行数
+    }
+    
+    # 上流APIのヘッジ設定（遅い予報取得に複製リクエストを送る）
+    HEDGE_OPTIONS = {
+        'enabled': os.getenv('HEDGE_ENABLED', 'false').lower() == 'true',
+        'percentile': float(os.getenv('HEDGE_PERCENTILE', 95)),  # 直近レイテンシのこの値を超えたら送信
+        'min_delay': 0.05,  # 最小待ち時間（秒）
+        'budget': float(os.getenv('HEDGE_BUDGET', 0.05)),  # 呼び出し全体に対するヘッジの上限割合
+        'min_samples': 20,  # ヘッジ開始に必要なレイテンシ標本数
+        'window': 200,  # 集計対象の直近呼び出し数
+    }
+    
+    # 天気予報の保持日数（お気に入り / プリセット / その他）
+    FORECAST_RETENTION_DAYS = {
+        'favorite': int(os.getenv('RETENTION_DAYS_FAVORITE', 30)),
+        'preset': int(os.getenv('RETENTION_DAYS_PRESET', 14)),
+        'default': int(os.getenv('RETENTION_DAYS_DEFAULT', 7)),
+    }
+    RETENTION_CHUNK_SIZE = 500  # 1トランザクションで削除する最大件数
+    RETENTION_CHUNK_PAUSE = 0.01  # チャンク間の待機（秒）
+    
+    # レスポンスキャッシュ設定（シリアライズ済みJSONの保持上限）
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+    RESPONSE_CACHE_TTL = CACHE_DURATION  # 検知できない更新（DBの直接編集等）に備えた有効期限（秒）
+    
+    # 他プロセス（batch.py・別ワーカー）によるDB更新を確認する間隔（秒）
+    DATA_VERSION_CHECK_INTERVAL = float(os.getenv('DATA_VERSION_CHECK_INTERVAL', 1.0))
+    
+    # インメモリ予報ストア（有効時は読み込みAPIがDBを介さず応答）
+    FORECAST_STORE_ENABLED = os.getenv('FORECAST_STORE_ENABLED', 'false').lower() == 'true'
+    
+    # レスポンス圧縮設定（brotliパッケージがあればbrを優先）
+    COMPRESSION_ENABLED = True
+    COMPRESSION_MIN_SIZE = 500  # これ未満のバイト数は圧縮しない
+    COMPRESSION_LEVEL = 5
+    
+    # 空間インデックス設定
+    SPATIAL_CELL_DEGREES = 1.0  # グリッドのセル幅（度）
+    MAX_SPATIAL_RESULTS = 5000  # 範囲検索で返す最大件数
+    
+    # ランキングAPIの1ページあたりの最大件数
+    MAX_RANKING_RESULTS = 100
+    
+    # 共有キャッシュ設定（複数ノードで上流APIの取得結果を共有）
+    # memory:// / file:///path/to/dir / redis://host:6379/0、空なら無効
+    SHARED_CACHE_URL = os.getenv('SHARED_CACHE_URL', '')
+    GEOCODE_CACHE_DURATION = 86400  # 24時間
+    
+    # 明日の天気ボード（プリセット＋お気に入りの事前生成ファイル）
+    BOARD_DIR = os.getenv('BOARD_DIR', '')  # 空なら data/board
+    BOARD_KEEP_VERSIONS = 5  # 版付きURLのために残す過去の版数
+    
+    # リクエストプロファイリング（無効時はフックを登録しない）
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0.0))  # 0.0-1.0
+    PROFILING_SLOW_MS = int(os.getenv('PROFILING_SLOW_MS', 500))  # 保存するリクエストの所要時間
+    PROFILING_MAX_PROFILES = 50  # ディスクに保持する件数
+    PROFILING_DIR = os.getenv('PROFILING_DIR', '')  # 空なら data/profiles
+    
+    # 管理API・X-Profileヘッダー用トークン（空ならローカルからのみ管理APIを許可）
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+    
     # 日本の主要都市プリセット
     PRESET_LOCATIONS = [
         {'name': 'Tokyo', 'name_jp': '東京', 'lat': 35.6762, 'lon': 139.6503, 'country_code': 'JP'},
@@ -0,0 +1,14 @@
+"""
+データ更新世代モデル
+"""
+from models import db
+
+class DataVersion(db.Model):
+    """更新の種類ごとの世代番号（プロセス間の更新検知用、種類ごとに1行）"""
+    __tablename__ = 'data_versions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DataVersion {self.version}>'
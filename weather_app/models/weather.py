@@ -25,7 +25,15 @@ class WeatherForecast(db.Model):
     
     # インデックス
     __table_args__ = (
-        db.Index('idx_location_date', 'location_id', 'forecast_date'),
+        # 地域・予報日ごとに1行（一括アップサートの競合キー）
+        db.Index('uq_location_date', 'location_id', 'forecast_date', unique=True),
+        # 予報ストアの差分読み込み（取得日時以降の行）
+        db.Index('idx_fetched_at', 'fetched_at'),
+        # 保持期間切れの削除対象を地域ごとに範囲検索で絞り込む（インデックスのみで完結）
+        db.Index('idx_location_fetched_at', 'location_id', 'fetched_at'),
+        # 予報日ごとのランキング（値の順に走査し、同値は地域IDで順序を固定）
+        db.Index('idx_date_temp_max', 'forecast_date', 'temp_max', 'location_id'),
+        db.Index('idx_date_pop', 'forecast_date', 'precipitation_probability', 'location_id'),
     )
     
     def to_dict(self):
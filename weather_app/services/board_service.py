@@ -0,0 +1,171 @@
+"""
+明日の天気ボード（プリセット＋お気に入り）のスナップショット
+"""
+from flask import render_template
+from sqlalchemy import or_
+from datetime import datetime
+from typing import Dict, List, Optional
+from models.location import Location
+from services.data_service import DataService
+from services.export_service import write_csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 成果物の形式とMIMEタイプ
+BOARD_FORMATS = {
+    'json': 'application/json',
+    'csv': 'text/csv',
+    'html': 'text/html'
+}
+
+MANIFEST_NAME = 'current.json'
+
+
+class BoardSnapshots:
+    """
+    天気ボードの事前生成
+
+    プリセット地域とお気に入りの最新予報を JSON / CSV / HTML に書き出し、
+    内容ハッシュを版とした board-<版>.<形式>（と .gz）を作成してから
+    current.json（現在の版を指すマニフェスト）を置き換える。
+    書き込みはすべて一時ファイルからの os.replace のため、
+    読み込み側が書きかけのファイルを見ることはない。
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.keep_versions = 5
+        self.preset_names: List[str] = []
+        self._manifest: Optional[Dict] = None
+        self._manifest_stat = None
+        self._build_lock = threading.Lock()
+
+    def init_app(self, app):
+        """設定を反映し、ボードが未作成なら作成（アプリケーションコンテキスト内で呼ぶ）"""
+        self.directory = app.config.get('BOARD_DIR') or os.path.join(app.root_path, 'data', 'board')
+        self.keep_versions = app.config.get('BOARD_KEEP_VERSIONS', self.keep_versions)
+        self.preset_names = [preset['name'] for preset in app.config.get('PRESET_LOCATIONS', [])]
+        os.makedirs(self.directory, exist_ok=True)
+        if self.current() is None:
+            self.build()
+
+    def board_location_ids(self) -> List[int]:
+        """ボード対象の地域ID（プリセット順、続いてお気に入りを名前順）"""
+        rows = Location.query.filter(
+            or_(Location.name.in_(self.preset_names), Location.is_favorite.is_(True))
+        ).with_entities(Location.id, Location.name).all()
+        order = {name: index for index, name in enumerate(self.preset_names)}
+        rows.sort(key=lambda row: (order.get(row.name, len(order)), row.name))
+        return [row.id for row in rows]
+
+    def build(self) -> Dict:
+        """
+        ボードを作成して現在の版を切り替える
+
+        Returns:
+            マニフェスト（内容が前回と同じ場合は既存の版）
+        """
+        with self._build_lock:
+            forecasts = DataService.get_weather_forecasts_by_locations(self.board_location_ids())
+            dates = [item['weather']['forecast_date'] for item in forecasts if item['weather']['forecast_date']]
+            board_date = max(dates) if dates else None
+            body = json.dumps(
+                {'date': board_date, 'forecasts': forecasts}, ensure_ascii=False, sort_keys=True
+            ).encode('utf-8')
+            version = hashlib.sha256(body).hexdigest()[:12]
+
+            current = self.current()
+            if current and current['version'] == version:
+                return current
+
+            csv_output = io.StringIO()
+            write_csv(forecasts, csv_output)
+            built_at = datetime.utcnow().isoformat()
+            html = render_template('board.html', forecasts=forecasts, board_date=board_date, built_at=built_at)
+
+            artifacts = {
+                'json': body,
+                'csv': csv_output.getvalue().encode('utf-8'),
+                'html': html.encode('utf-8')
+            }
+            for fmt, data in artifacts.items():
+                path = self.artifact_path(version, fmt)
+                self._atomic_write(path, data)
+                self._atomic_write(f"{path}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+
+            manifest = {
+                'version': version,
+                'date': board_date,
+                'count': len(forecasts),
+                'built_at': built_at,
+                'files': {fmt: os.path.basename(self.artifact_path(version, fmt)) for fmt in artifacts}
+            }
+            self._atomic_write(
+                os.path.join(self.directory, MANIFEST_NAME),
+                json.dumps(manifest, ensure_ascii=False).encode('utf-8')
+            )
+            self._trim(version)
+        logger.info(f"天気ボードを作成しました: {len(forecasts)}件 (版 {version})")
+        return manifest
+
+    def current(self) -> Optional[Dict]:
+        """現在の版のマニフェスト（ファイルが変わった場合のみ読み直す）"""
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if self._manifest_stat != key:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._manifest, self._manifest_stat = manifest, key
+        return self._manifest
+
+    def artifact_path(self, version: str, fmt: str) -> str:
+        """版・形式に対応する成果物のパス"""
+        return os.path.join(self.directory, f"board-{version}.{fmt}")
+
+    def _atomic_write(self, path: str, data: bytes):
+        """一時ファイルに書いてから置き換える"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _trim(self, current_version: str):
+        """古い版を削除（配信中のURLのため直近 keep_versions 版は残す）"""
+        versions: Dict[str, float] = {}
+        for name in os.listdir(self.directory):
+            if name.startswith('board-') and name.endswith('.json'):
+                version = name[len('board-'):-len('.json')]
+                versions[version] = os.path.getmtime(os.path.join(self.directory, name))
+        keep = set(sorted(versions, key=versions.get, reverse=True)[:self.keep_versions])
+        keep.add(current_version)
+        for version in versions:
+            if version in keep:
+                continue
+            for fmt in BOARD_FORMATS:
+                for suffix in ('', '.gz'):
+                    try:
+                        os.remove(self.artifact_path(version, fmt) + suffix)
+                    except OSError:
+                        pass
+
+
+board_snapshots = BoardSnapshots()
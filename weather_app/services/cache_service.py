@@ -0,0 +1,223 @@
+"""
+シリアライズ済みレスポンスキャッシュサービス
+"""
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# エントリ1件あたりの管理オーバーヘッド概算（キー・OrderedDictノード分）
+ENTRY_OVERHEAD_BYTES = 200
+
+# 全地域に依存するエントリ（地域一覧など）を表す索引キー
+ALL_LOCATIONS = '*'
+
+
+class ResponseCache:
+    """
+    JSONシリアライズ済みバイト列のLRUキャッシュ
+
+    エントリごとに依存する地域IDを索引化し、データ更新時は
+    該当地域を含むエントリのみを無効化する。圧縮済みの本文も
+    圧縮形式ごとにエントリへ保持し、ヒットのたびに圧縮し直さない。他プロセスによる更新は
+    data_version の検知で全体を破棄し、検知できない更新に備えて
+    エントリは ttl 秒で期限切れにする。
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, ttl: float = 1800):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = True
+        # キー -> (本文, 依存地域ID, 期限, 圧縮形式 -> 圧縮済み本文)
+        self._entries: 'OrderedDict[Hashable, Tuple[bytes, Tuple, float, Dict[str, bytes]]]' = OrderedDict()
+        self._index: Dict[Hashable, Set[Hashable]] = {}
+        self._size = 0
+        self._version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        """アプリケーション設定を反映"""
+        self.max_bytes = app.config.get('RESPONSE_CACHE_MAX_BYTES', self.max_bytes)
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', self.ttl)
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.clear()
+
+    @property
+    def version(self) -> int:
+        """
+        無効化世代番号
+
+        読み込み前に取得し put() に渡すことで、生成中に更新された
+        古いペイロードが登録されるのを防ぐ。
+        """
+        return self._version
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """
+        キャッシュを取得
+
+        Args:
+            key: キャッシュキー
+
+        Returns:
+            シリアライズ済みバイト列、未登録時はNone
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, body: bytes, location_ids: Iterable[Hashable], version: int) -> bool:
+        """
+        キャッシュに登録
+
+        Args:
+            key: キャッシュキー
+            body: シリアライズ済みバイト列
+            location_ids: エントリが依存する地域ID（ALL_LOCATIONSも可）
+            version: ペイロード生成前に取得した世代番号
+
+        Returns:
+            登録できた場合True
+        """
+        if not self.enabled:
+            return False
+        cost = len(body) + ENTRY_OVERHEAD_BYTES
+        if cost > self.max_bytes:
+            return False
+
+        deps = tuple(set(location_ids))
+        with self._lock:
+            # 生成中に無効化が走った場合は古いデータなので登録しない
+            if version != self._version:
+                return False
+            self._remove(key)
+            self._entries[key] = (body, deps, time.monotonic() + self.ttl, {})
+            self._size += cost
+            for dep in deps:
+                self._index.setdefault(dep, set()).add(key)
+            self._evict()
+        return True
+
+    def get_encoded(self, key: Hashable, body: bytes, encoding: str) -> Optional[bytes]:
+        """
+        圧縮済みの本文を取得
+
+        Args:
+            key: キャッシュキー
+            body: get() で取得した本文（取得後に差し替わったエントリは使わない）
+            encoding: 圧縮形式
+
+        Returns:
+            圧縮済みバイト列、未登録時はNone
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not body:
+                return None
+            return entry[3].get(encoding)
+
+    def put_encoded(self, key: Hashable, body: bytes, encoding: str, data: bytes) -> bool:
+        """
+        圧縮済みの本文をエントリに追加
+
+        Args:
+            key: キャッシュキー
+            body: 圧縮元の本文
+            encoding: 圧縮形式
+            data: 圧縮済みバイト列
+
+        Returns:
+            登録できた場合True
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not body or encoding in entry[3]:
+                return False
+            entry[3][encoding] = data
+            self._size += len(data)
+            self._evict()
+        return True
+
+    def invalidate_location(self, location_id: int):
+        """
+        指定地域に依存するエントリと地域一覧を無効化
+
+        Args:
+            location_id: 地域ID
+        """
+        with self._lock:
+            self._version += 1
+            keys = set(self._index.get(location_id, ()))
+            keys |= self._index.get(ALL_LOCATIONS, set())
+            for key in keys:
+                self._remove(key)
+        if keys:
+            logger.debug(f"レスポンスキャッシュを無効化: location_id={location_id}, {len(keys)}件")
+
+    def invalidate_forecasts(self, location_id: int):
+        """
+        指定地域の予報に依存するエントリのみ無効化
+
+        Args:
+            location_id: 地域ID
+        """
+        with self._lock:
+            self._version += 1
+            for key in set(self._index.get(location_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        """全エントリを削除"""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._index.clear()
+            self._size = 0
+
+    def stats(self) -> Dict:
+        """統計情報を取得"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def _evict(self):
+        """上限を超えた分を古い順に削除（ロック取得済みで呼ぶこと）"""
+        while self._size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Hashable):
+        """エントリを削除（ロック取得済みで呼ぶこと）"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        body, deps, _, variants = entry
+        self._size -= len(body) + ENTRY_OVERHEAD_BYTES + sum(len(data) for data in variants.values())
+        for dep in deps:
+            keys = self._index.get(dep)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[dep]
+
+
+response_cache = ResponseCache()
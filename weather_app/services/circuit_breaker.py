@@ -0,0 +1,139 @@
+"""
+上流API呼び出し用サーキットブレーカー
+"""
+from collections import deque
+from typing import Deque, Dict, Tuple
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    失敗率ベースのサーキットブレーカー
+
+    直近 window 秒の呼び出しのうち min_calls 件以上で失敗率が
+    failure_threshold を超えると OPEN になり、open_duration 秒間は
+    呼び出しを即座に拒否する。その後 HALF_OPEN で half_open_max_calls 件まで
+    試行を許し、すべて成功すれば CLOSED に戻る。1件でも失敗すれば再び OPEN。
+    """
+
+    def __init__(self, name: str, failure_threshold: float = 0.5, min_calls: int = 3,
+                 window: float = 60.0, open_duration: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self._calls: Deque[Tuple[float, bool]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """現在の状態（OPENの待機時間経過後はHALF_OPENとして扱う）"""
+        with self._lock:
+            self._update_state(time.monotonic())
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        呼び出しを許可するか判定
+
+        Returns:
+            許可する場合True。True を返した場合は必ず record_success /
+            record_failure のいずれかを呼ぶこと
+        """
+        with self._lock:
+            self._update_state(time.monotonic())
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return True
+            return False
+
+    def record_success(self):
+        """呼び出し成功を記録"""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == STATE_HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    logger.info(f"サーキットを閉じました（復旧）: {self.name}")
+                    self._state = STATE_CLOSED
+                    self._calls.clear()
+                return
+            self._calls.append((now, True))
+            self._trim(now)
+
+    def record_failure(self):
+        """呼び出し失敗を記録"""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == STATE_HALF_OPEN:
+                self._open(now)
+                return
+            self._calls.append((now, False))
+            self._trim(now)
+            failures = sum(1 for _, ok in self._calls if not ok)
+            if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.failure_threshold:
+                self._open(now)
+
+    def release(self):
+        """判定対象外の結果で終わった試行を取り消す（HALF_OPEN枠の返却）"""
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+
+    def remaining_open_seconds(self) -> float:
+        """OPEN状態の残り秒数"""
+        with self._lock:
+            if self._state != STATE_OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.open_duration - time.monotonic())
+
+    def stats(self) -> Dict:
+        """状態と直近の呼び出し件数を取得"""
+        with self._lock:
+            now = time.monotonic()
+            self._update_state(now)
+            self._trim(now)
+            return {
+                'state': self._state,
+                'calls': len(self._calls),
+                'failures': sum(1 for _, ok in self._calls if not ok)
+            }
+
+    def _open(self, now: float):
+        """OPENに遷移（ロック取得済みで呼ぶこと）"""
+        if self._state != STATE_OPEN:
+            logger.warning(f"サーキットを開きました（上流障害）: {self.name}")
+        self._state = STATE_OPEN
+        self._opened_at = now
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+
+    def _update_state(self, now: float):
+        """OPENの待機時間経過でHALF_OPENへ遷移（ロック取得済みで呼ぶこと）"""
+        if self._state == STATE_OPEN and now - self._opened_at >= self.open_duration:
+            self._state = STATE_HALF_OPEN
+            self._half_open_in_flight = 0
+            self._half_open_successes = 0
+
+    def _trim(self, now: float):
+        """集計窓より古い記録を削除（ロック取得済みで呼ぶこと）"""
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
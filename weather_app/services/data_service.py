@@ -1,15 +1,29 @@
 """
 データ管理サービス
 """
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Optional, Dict
+from sqlalchemy import func
 from models import db
 from models.location import Location
 from models.weather import WeatherForecast
+from services.cache_service import response_cache
+from services.db_backend import upsert_forecasts, latest_forecasts, ranked_forecasts
+from services.retention_service import RetentionService
+from services.forecast_store import forecast_store
+from services.spatial_index import spatial_index
+from services.data_version import data_version, LOCATIONS, FORECASTS, FORECAST_DELETES
+from config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
+# ランキングに使える項目（インデックスのあるカラムのみ）
+RANKING_METRICS = {
+    'temp_max': WeatherForecast.temp_max,
+    'precipitation_probability': WeatherForecast.precipitation_probability
+}
+
 class DataService:
     """データ管理サービス"""
     
@@ -59,6 +73,11 @@ class DataService:
         )
         db.session.add(location)
         db.session.commit()
+        data_version.bump(LOCATIONS)
+        # SQLiteはIDを再利用し得るため、同じIDを参照していたエントリも破棄
+        response_cache.invalidate_location(location.id)
+        forecast_store.put_location(location)
+        spatial_index.add(location.id, location.lat, location.lon)
         logger.info(f"地域を追加しました: {name}")
         return location
     
@@ -77,6 +96,10 @@ class DataService:
         if location:
             db.session.delete(location)
             db.session.commit()
+            data_version.bump(LOCATIONS)
+            response_cache.invalidate_location(location_id)
+            forecast_store.remove_location(location_id)
+            spatial_index.remove(location_id)
             logger.info(f"地域を削除しました: {location.name}")
             return True
         return False
@@ -96,6 +119,9 @@ class DataService:
         if location:
             location.is_favorite = not location.is_favorite
             db.session.commit()
+            data_version.bump(LOCATIONS)
+            response_cache.invalidate_location(location_id)
+            forecast_store.put_location(location)
             logger.info(f"お気に入りを更新: {location.name} -> {location.is_favorite}")
             return location
         return None
@@ -135,6 +161,9 @@ class DataService:
         )
         db.session.add(forecast)
         db.session.commit()
+        data_version.bump(FORECASTS)
+        response_cache.invalidate_forecasts(location_id)
+        forecast_store.put_forecasts([forecast])
         logger.info(f"天気予報を保存しました: location_id={location_id}")
         return forecast
     
@@ -155,6 +184,52 @@ class DataService:
             query = query.filter_by(forecast_date=date)
         return query.order_by(WeatherForecast.fetched_at.desc()).first()
     
+    @staticmethod
+    def save_weather_forecasts(items: List[Dict]) -> int:
+        """
+        複数地域の天気予報を一括保存
+        
+        Args:
+            items: location_id と天気データ（save_weather_forecastと同形式）を
+                   持つ辞書のリスト
+            
+        Returns:
+            保存件数
+        """
+        rows = []
+        for item in items:
+            weather_data = item['weather_data']
+            rows.append({
+                'location_id': item['location_id'],
+                'forecast_date': datetime.fromisoformat(weather_data['date']),
+                'weather_main': weather_data.get('weather_main'),
+                'weather_description': weather_data.get('weather_description'),
+                'temp_max': weather_data.get('temp_max'),
+                'temp_min': weather_data.get('temp_min'),
+                'humidity': weather_data.get('humidity'),
+                'pressure': weather_data.get('pressure'),
+                'wind_speed': weather_data.get('wind_speed'),
+                'wind_deg': weather_data.get('wind_deg'),
+                'precipitation_probability': weather_data.get('precipitation_probability'),
+                'icon_code': weather_data.get('icon_code')
+            })
+        
+        saved = upsert_forecasts(rows)
+        data_version.bump(FORECASTS)
+        location_ids = {row['location_id'] for row in rows}
+        for location_id in location_ids:
+            response_cache.invalidate_forecasts(location_id)
+        
+        if forecast_store.enabled:
+            # アップサートは行を返さないため、保存した行を読み直して反映
+            dates = {row['forecast_date'] for row in rows}
+            forecast_store.put_forecasts(WeatherForecast.query.filter(
+                WeatherForecast.location_id.in_(location_ids),
+                WeatherForecast.forecast_date.in_(dates)
+            ).all())
+        logger.info(f"天気予報を一括保存しました: {saved}件")
+        return saved
+    
     @staticmethod
     def get_weather_forecasts_by_locations(location_ids: List[int], date: datetime = None) -> List[Dict]:
         """
@@ -165,12 +240,22 @@ class DataService:
             date: 予報日
             
         Returns:
-            天気予報のリスト
+            天気予報のリスト（location_idsの順序）
         """
+        if forecast_store.enabled:
+            return forecast_store.get_forecasts_by_locations(location_ids, date)
+        
+        # 地域数に関わらず地域・予報それぞれ1クエリで取得
+        locations = {
+            location.id: location
+            for location in Location.query.filter(Location.id.in_(location_ids)).all()
+        }
+        forecasts = latest_forecasts(location_ids, date)
+        
         results = []
         for location_id in location_ids:
-            location = DataService.get_location_by_id(location_id)
-            forecast = DataService.get_weather_forecast(location_id, date)
+            location = locations.get(location_id)
+            forecast = forecasts.get(location_id)
             
             if location and forecast:
                 results.append({
@@ -181,16 +266,78 @@ class DataService:
         return results
     
     @staticmethod
-    def cleanup_old_forecasts(days: int = 7):
+    def get_latest_forecast_date() -> Optional[datetime]:
+        """保存済みの最も新しい予報日"""
+        return db.session.query(func.max(WeatherForecast.forecast_date)).scalar()
+    
+    @staticmethod
+    def get_forecast_ranking(metric: str, date: datetime = None, descending: bool = True,
+                             limit: int = 10, after: tuple = None,
+                             min_value: float = None, max_value: float = None) -> Dict:
+        """
+        予報日の天気予報を項目の順に取得
+        
+        Args:
+            metric: RANKING_METRICS のキー
+            date: 予報日（Noneの場合は最新の予報日）
+            descending: 降順の場合True
+            limit: 最大件数
+            after: 前ページの next の値
+            min_value: 下限（以上）
+            max_value: 上限（以下）
+            
+        Returns:
+            {'date': 予報日, 'forecasts': 天気予報のリスト, 'next': 次ページの開始位置またはNone}
+        """
+        column = RANKING_METRICS[metric]
+        date = date or DataService.get_latest_forecast_date()
+        if date is None:
+            return {'date': None, 'forecasts': [], 'next': None}
+        
+        # 次ページの有無を判定するため1件多く取得
+        forecasts = ranked_forecasts(column, date, descending, limit + 1, after, min_value, max_value)
+        has_more = len(forecasts) > limit
+        forecasts = forecasts[:limit]
+        
+        locations = {
+            location.id: location
+            for location in Location.query.filter(
+                Location.id.in_([forecast.location_id for forecast in forecasts])
+            ).all()
+        }
+        results = [
+            {'location': locations[forecast.location_id].to_dict(), 'weather': forecast.to_dict()}
+            for forecast in forecasts if forecast.location_id in locations
+        ]
+        
+        last = forecasts[-1] if forecasts else None
+        return {
+            'date': date,
+            'forecasts': results,
+            'next': (getattr(last, metric), last.location_id) if has_more else None
+        }
+    
+    @staticmethod
+    def cleanup_old_forecasts(days: int = None) -> Dict:
         """
         古い天気予報を削除
         
         Args:
-            days: 保持日数
+            days: 通常地域の保持日数（Noneの場合は設定値）
+            
+        Returns:
+            削除件数と所要時間を含む結果
         """
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-        deleted = WeatherForecast.query.filter(
-            WeatherForecast.fetched_at < cutoff_date
-        ).delete()
-        db.session.commit()
-        logger.info(f"古い天気予報を削除しました: {deleted}件")
+        retention = RetentionService(
+            retention_days=Config.FORECAST_RETENTION_DAYS,
+            preset_names=[preset['name'] for preset in Config.PRESET_LOCATIONS],
+            chunk_size=Config.RETENTION_CHUNK_SIZE,
+            pause=Config.RETENTION_CHUNK_PAUSE
+        )
+        result = retention.purge(default_days=days)
+        if result['deleted']:
+            data_version.bump(FORECAST_DELETES)
+            response_cache.clear()
+            if forecast_store.enabled:
+                forecast_store.load()
+        return result
@@ -0,0 +1,132 @@
+"""
+プロセス間のデータ更新検知
+"""
+from typing import Callable, Dict, List, Optional
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from models import db
+from models.data_version import DataVersion
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 更新の種類
+LOCATIONS = 'locations'
+FORECASTS = 'forecasts'
+FORECAST_DELETES = 'forecast_deletes'
+
+# 種類ごとの世代番号を保持する行のID
+VERSION_ROWS = {
+    LOCATIONS: 1,
+    FORECASTS: 2,
+    FORECAST_DELETES: 3
+}
+
+
+class DataVersionTracker:
+    """
+    DBの更新世代番号によるプロセス間の更新検知
+
+    DataService の更新系メソッドはコミット後に、更新の種類（地域・予報の保存・
+    予報の削除）ごとの世代番号を1つ進める。各プロセスは before_request で
+    最大 check_interval 秒に1回番号を確認し、他のプロセス（batch.py や別ワーカー）
+    による更新を検知したら、その種類に登録されたコールバック（予報ストアの
+    差分読み込みなど）をバックグラウンドのスレッドで呼ぶ。リクエストは
+    反映を待たずに処理を続け、反映中は次の確認を行わない。
+    自プロセスの更新は各キャッシュへ直接反映済みのため通知しない。
+    """
+
+    def __init__(self):
+        self.check_interval = 1.0
+        self._known: Dict[str, Optional[int]] = {scope: None for scope in VERSION_ROWS}
+        self._checked_at = 0.0
+        self._callbacks: Dict[str, List[Callable[[], None]]] = {scope: [] for scope in VERSION_ROWS}
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """世代番号の行を用意し before_request を登録（アプリケーションコンテキスト内で呼ぶ）"""
+        self.check_interval = app.config.get('DATA_VERSION_CHECK_INTERVAL', self.check_interval)
+        for row_id in VERSION_ROWS.values():
+            if db.session.get(DataVersion, row_id) is not None:
+                continue
+            try:
+                db.session.add(DataVersion(id=row_id, version=0))
+                db.session.commit()
+            except IntegrityError:
+                # 別プロセスが同時に作成した
+                db.session.rollback()
+        self._known = self._read()
+        self._checked_at = time.monotonic()
+        app.before_request(self.check)
+
+    def on_change(self, scope: str, callback: Callable[[], None]):
+        """他プロセスによる scope の更新を検知した際のコールバックを登録（登録順に呼ぶ）"""
+        self._callbacks[scope].append(callback)
+
+    def bump(self, scope: str):
+        """更新をコミットした後に呼び、scope の世代番号を進める"""
+        row_id = VERSION_ROWS[scope]
+        db.session.query(DataVersion).filter(DataVersion.id == row_id).update(
+            {DataVersion.version: DataVersion.version + 1}, synchronize_session=False
+        )
+        db.session.commit()
+        version = db.session.query(DataVersion.version).filter(DataVersion.id == row_id).scalar()
+        with self._lock:
+            # 自プロセスの更新のみなら既知の番号を進める。
+            # 間に他プロセスの更新があれば次回の check で検知させる
+            known = self._known.get(scope)
+            if known is not None and version == known + 1:
+                self._known[scope] = version
+
+    def check(self):
+        """他プロセスの更新を確認し、あればバックグラウンドで反映（check_interval 秒に1回まで）"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        versions = self._read()
+        with self._lock:
+            changed = [scope for scope, version in versions.items() if version != self._known.get(scope)]
+        if not changed:
+            return
+        logger.info(f"他プロセスによるデータ更新を検知しました: {', '.join(changed)}")
+        self._refresh_thread = threading.Thread(
+            target=self._apply, args=(current_app._get_current_object(), versions, changed),
+            name='data-version-refresh', daemon=True
+        )
+        self._refresh_thread.start()
+
+    def wait(self, timeout: Optional[float] = None):
+        """反映中のバックグラウンド処理の完了を待つ"""
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout)
+
+    def _apply(self, app, versions: Dict[str, int], changed: List[str]):
+        """検知した種類のコールバックを呼び、成功した種類の番号を既知にする"""
+        with app.app_context():
+            for scope in changed:
+                ok = True
+                for callback in self._callbacks[scope]:
+                    try:
+                        callback()
+                    except Exception as e:
+                        ok = False
+                        logger.error(f"更新検知の反映エラー（{scope}）: {e}")
+                if ok:
+                    with self._lock:
+                        self._known[scope] = versions[scope]
+
+    @staticmethod
+    def _read() -> Dict[str, int]:
+        rows = dict(db.session.query(DataVersion.id, DataVersion.version).filter(
+            DataVersion.id.in_(VERSION_ROWS.values())
+        ).all())
+        return {scope: rows.get(row_id) or 0 for scope, row_id in VERSION_ROWS.items()}
+
+
+data_version = DataVersionTracker()
@@ -0,0 +1,265 @@
+"""
+データベースバックエンド設定とダイアレクト別高速パス
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, func, inspect, or_
+from sqlalchemy.engine import make_url
+from models import db
+from models.weather import WeatherForecast
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 上書き対象の予報カラム（キー列と主キーを除く）
+FORECAST_VALUE_COLUMNS = [
+    'weather_main', 'weather_description', 'temp_max', 'temp_min',
+    'humidity', 'pressure', 'wind_speed', 'wind_deg',
+    'precipitation_probability', 'icon_code', 'fetched_at'
+]
+
+# (location_id, forecast_date) の一意インデックス有無（エンジンURLごと）
+_unique_index_cache: Dict[str, bool] = {}
+
+
+def resolve_database_uri(uri: Optional[str], app_root: str) -> str:
+    """
+    設定されたDB URLを実際に使うURLへ正規化
+
+    Args:
+        uri: 設定値（DATABASE_URL）
+        app_root: アプリケーションのルートディレクトリ
+
+    Returns:
+        SQLAlchemyに渡すURL。未設定時は data/weather.db の絶対パス
+    """
+    if not uri:
+        return f"sqlite:///{os.path.join(app_root, 'data', 'weather.db')}"
+
+    # Heroku等の旧形式スキームを SQLAlchemy 2 の表記に合わせる
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        database = url.database
+        # 相対パスはインスタンスフォルダではなくアプリルート基準で解決
+        if database and database != ':memory:' and not database.startswith('file:') \
+                and not os.path.isabs(database):
+            url = url.set(database=os.path.join(app_root, database))
+            os.makedirs(os.path.dirname(url.database), exist_ok=True)
+        return url.render_as_string(hide_password=False)
+    return uri
+
+
+def build_engine_options(uri: str, config: Dict) -> Dict:
+    """
+    ダイアレクトに応じたエンジンオプションを生成
+
+    Args:
+        uri: 正規化済みDB URL
+        config: アプリケーション設定
+
+    Returns:
+        SQLALCHEMY_ENGINE_OPTIONS に渡す辞書
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if make_url(uri).get_backend_name() == 'sqlite':
+        # SQLiteはファイルロックで直列化されるためプール調整は行わない
+        return options
+
+    options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+    options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+    options.setdefault('pool_pre_ping', config.get('DB_POOL_PRE_PING', True))
+    options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+    options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+    return options
+
+
+def ensure_indexes():
+    """
+    既存DBに不足しているインデックスを作成
+
+    db.create_all() は既存テーブルにインデックスを追加しないため、
+    モデルに後から追加したインデックスをここで補う。
+    """
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind=db.engine)
+                logger.info(f"インデックスを作成しました: {index.name}")
+            except Exception as e:
+                # 一意制約に反する既存データ等。汎用パスで動作は継続できる
+                logger.warning(f"インデックスを作成できません: {index.name}: {e}")
+    _unique_index_cache.clear()
+
+
+def has_unique_forecast_index() -> bool:
+    """(location_id, forecast_date) に一意インデックスがあるか"""
+    key = str(db.engine.url)
+    if key not in _unique_index_cache:
+        indexes = inspect(db.engine).get_indexes(WeatherForecast.__tablename__)
+        _unique_index_cache[key] = any(
+            ix.get('unique') and list(ix['column_names']) == ['location_id', 'forecast_date']
+            for ix in indexes
+        )
+    return _unique_index_cache[key]
+
+
+def upsert_forecasts(rows: List[Dict]) -> int:
+    """
+    予報を (location_id, forecast_date) 単位で一括上書き保存
+
+    PostgreSQL/SQLite は INSERT ... ON CONFLICT、MySQL は
+    ON DUPLICATE KEY UPDATE を1文で発行する。一意インデックスが無い場合は
+    削除と一括挿入を1トランザクションで行う。
+
+    Args:
+        rows: WeatherForecastのカラム名をキーとする辞書のリスト
+
+    Returns:
+        保存件数
+    """
+    if not rows:
+        return 0
+
+    now = datetime.utcnow()
+    rows = [{**row, 'fetched_at': row.get('fetched_at') or now} for row in rows]
+    dialect = db.engine.dialect.name
+    table = WeatherForecast.__table__
+
+    if dialect in ('postgresql', 'sqlite') and has_unique_forecast_index():
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['location_id', 'forecast_date'],
+            set_={col: stmt.excluded[col] for col in FORECAST_VALUE_COLUMNS}
+        )
+        db.session.execute(stmt)
+    elif dialect in ('mysql', 'mariadb') and has_unique_forecast_index():
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            {col: stmt.inserted[col] for col in FORECAST_VALUE_COLUMNS}
+        )
+        db.session.execute(stmt)
+    else:
+        for row in rows:
+            WeatherForecast.query.filter_by(
+                location_id=row['location_id'],
+                forecast_date=row['forecast_date']
+            ).delete(synchronize_session=False)
+        db.session.execute(table.insert(), rows)
+
+    db.session.commit()
+    return len(rows)
+
+
+def latest_forecasts(location_ids: List[int], date: datetime = None) -> Dict[int, WeatherForecast]:
+    """
+    地域ごとの最新予報を1クエリで取得
+
+    PostgreSQL は DISTINCT ON、その他は ROW_NUMBER() ウィンドウ関数を使う。
+
+    Args:
+        location_ids: 地域IDのリスト
+        date: 予報日（Noneの場合は取得日時が最新のもの）
+
+    Returns:
+        地域IDをキーとする天気予報の辞書
+    """
+    if not location_ids:
+        return {}
+
+    conditions = [WeatherForecast.location_id.in_(location_ids)]
+    if date:
+        conditions.append(WeatherForecast.forecast_date == date)
+
+    if db.engine.dialect.name == 'postgresql':
+        query = WeatherForecast.query.filter(*conditions).distinct(
+            WeatherForecast.location_id
+        ).order_by(
+            WeatherForecast.location_id,
+            WeatherForecast.fetched_at.desc(),
+            WeatherForecast.id.desc()
+        )
+    else:
+        ranked = db.session.query(
+            WeatherForecast.id.label('id'),
+            func.row_number().over(
+                partition_by=WeatherForecast.location_id,
+                order_by=(WeatherForecast.fetched_at.desc(), WeatherForecast.id.desc())
+            ).label('rn')
+        ).filter(*conditions).subquery()
+        query = WeatherForecast.query.join(
+            ranked, WeatherForecast.id == ranked.c.id
+        ).filter(ranked.c.rn == 1)
+
+    return {forecast.location_id: forecast for forecast in query.all()}
+
+
+def ranked_forecasts(column, date: datetime, descending: bool = True, limit: int = 10,
+                     after: Optional[Tuple] = None, min_value=None, max_value=None) -> List[WeatherForecast]:
+    """
+    予報日の予報を指定カラムの順に取得（キーセットページング）
+
+    順位付けは (forecast_date, カラム, location_id) のインデックスに含まれる
+    列だけを読むため、テーブルを参照せずインデックスのみで完結する。
+    OFFSET と違い何ページ目でも読むのは limit 件で、その分の行だけを
+    (location_id, forecast_date) で改めて取得する。
+    同一予報日では location_id が一意なので、同値の順序は location_id で固定する。
+
+    Args:
+        column: 並び替えるカラム（WeatherForecast.temp_max など）
+        date: 予報日
+        descending: 降順の場合True
+        limit: 最大件数
+        after: 前ページ最後の (値, location_id)
+        min_value: 下限（以上）
+        max_value: 上限（以下）
+
+    Returns:
+        天気予報のリスト
+    """
+    conditions = [WeatherForecast.forecast_date == date, column.isnot(None)]
+    if min_value is not None:
+        conditions.append(column >= min_value)
+    if max_value is not None:
+        conditions.append(column <= max_value)
+    if after is not None:
+        value, location_id = after
+        if descending:
+            conditions.append(or_(column < value, and_(column == value, WeatherForecast.location_id < location_id)))
+        else:
+            conditions.append(or_(column > value, and_(column == value, WeatherForecast.location_id > location_id)))
+
+    if descending:
+        order = (column.desc(), WeatherForecast.location_id.desc())
+    else:
+        order = (column.asc(), WeatherForecast.location_id.asc())
+    keys = [
+        (location_id, value) for value, location_id in
+        db.session.query(column, WeatherForecast.location_id).filter(*conditions).order_by(*order).limit(limit)
+    ]
+    if not keys:
+        return []
+
+    # 一意インデックスの無いDBでは同一地域・日付の行が重複しうるため、
+    # 順位付けに使った値の行のうち取得日時が最新のものを採用する
+    rows = {}
+    for forecast in WeatherForecast.query.filter(
+        WeatherForecast.forecast_date == date,
+        WeatherForecast.location_id.in_([location_id for location_id, _ in keys])
+    ).order_by(WeatherForecast.fetched_at, WeatherForecast.id):
+        rows[(forecast.location_id, getattr(forecast, column.key))] = forecast
+    return [rows[key] for key in keys if key in rows]
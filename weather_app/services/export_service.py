@@ -0,0 +1,96 @@
+"""
+天気予報エクスポートサービス
+"""
+from typing import Dict, IO, List
+import csv
+import json
+
+# CSVヘッダー
+CSV_HEADER = [
+    '地域名', '日本語名', '日付', '天気', '天気詳細',
+    '最高気温(℃)', '最低気温(℃)', '湿度(%)', '気圧(hPa)',
+    '風速(m/s)', '風向(度)', '降水確率(%)'
+]
+
+SUPPORTED_FORMATS = ('csv', 'json', 'parquet')
+
+
+def forecast_to_row(item: Dict) -> List:
+    """
+    天気予報1件をCSVの行に変換
+    
+    Args:
+        item: {'location': ..., 'weather': ...} 形式の天気予報
+        
+    Returns:
+        CSV_HEADER順の値のリスト
+    """
+    loc = item['location']
+    weather = item['weather']
+    return [
+        loc['name'], loc['name_jp'], weather['forecast_date'],
+        weather['weather_main'], weather['weather_description'],
+        weather['temp_max'], weather['temp_min'],
+        weather['humidity'], weather['pressure'],
+        weather['wind_speed'], weather['wind_deg'],
+        weather['precipitation_probability']
+    ]
+
+
+def write_csv(forecasts: List[Dict], output: IO[str]):
+    """天気予報をCSV形式で書き出す"""
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+    for item in forecasts:
+        writer.writerow(forecast_to_row(item))
+
+
+def write_json(forecasts: List[Dict], output: IO[str]):
+    """天気予報をJSON形式で書き出す"""
+    json.dump({'forecasts': forecasts}, output, ensure_ascii=False, indent=2)
+
+
+def write_parquet(forecasts: List[Dict], path: str):
+    """
+    天気予報をParquet形式で書き出す
+    
+    Raises:
+        RuntimeError: pyarrowがインストールされていない場合
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet出力には pyarrow パッケージが必要です (pip install pyarrow)") from e
+
+    # 地域と予報を1行にまとめた列形式に変換
+    rows = [
+        {**{f"location_{k}": v for k, v in item['location'].items()}, **item['weather']}
+        for item in forecasts
+    ]
+    pq.write_table(pa.Table.from_pylist(rows), path)
+
+
+def export_to_file(forecasts: List[Dict], path: str, format_type: str):
+    """
+    天気予報をファイルに書き出す
+    
+    Args:
+        forecasts: 天気予報のリスト
+        path: 出力先
+        format_type: csv / json / parquet
+        
+    Raises:
+        ValueError: 未対応の形式の場合
+    """
+    if format_type == 'csv':
+        # Excelで文字化けしないようBOM付きUTF-8で保存
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            write_csv(forecasts, f)
+    elif format_type == 'json':
+        with open(path, 'w', encoding='utf-8') as f:
+            write_json(forecasts, f)
+    elif format_type == 'parquet':
+        write_parquet(forecasts, path)
+    else:
+        raise ValueError(f"サポートされていない形式です: {format_type}")
@@ -0,0 +1,407 @@
+"""
+読み込み用のインメモリ天気予報ストア
+"""
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+from models import db
+from models.location import Location
+from models.weather import WeatherForecast
+import math
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOCATION_FIELDS = (
+    'id', 'name', 'name_jp', 'lat', 'lon', 'country_code', 'is_favorite', 'created_at'
+)
+
+FORECAST_FIELDS = (
+    'id', 'location_id', 'forecast_date', 'weather_main', 'weather_description',
+    'temp_max', 'temp_min', 'humidity', 'pressure', 'wind_speed', 'wind_deg',
+    'precipitation_probability', 'icon_code', 'fetched_at'
+)
+
+_DATETIME_FIELDS = ('created_at', 'forecast_date', 'fetched_at')
+
+# 差分読み込みで遡る幅（取得日時の設定からコミットまでの遅れ・時計のずれを吸収）
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class _Record:
+    """__slots__ ベースの軽量レコード（ORMのインスタンス状態を持たない）"""
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    @classmethod
+    def from_object(cls, obj):
+        """ORMインスタンスから生成"""
+        return cls(*(getattr(obj, field) for field in cls.__slots__))
+
+    def to_dict(self) -> Dict:
+        """モデルの to_dict と同じ形式に変換"""
+        result = {}
+        for field in self.__slots__:
+            value = getattr(self, field)
+            if field in _DATETIME_FIELDS:
+                value = value.isoformat() if value else None
+            result[field] = value
+        return result
+
+
+class LocationRecord(_Record):
+    """地域レコード"""
+    __slots__ = LOCATION_FIELDS
+
+
+class ForecastRecord(_Record):
+    """天気予報レコード（列ストアから読み出した1行）"""
+    __slots__ = FORECAST_FIELDS
+
+
+class _IntColumn:
+    """整数列（Noneは型の最小値で表す）"""
+
+    def __init__(self, typecode: str):
+        self.data = array(typecode)
+        self.none = -2 ** (self.data.itemsize * 8 - 1)
+
+    def encode(self, value):
+        return self.none if value is None else int(value)
+
+    def decode(self, raw):
+        return None if raw == self.none else raw
+
+    serialize = decode
+
+
+class _FloatColumn:
+    """浮動小数点列（NoneはNaNで表す）"""
+
+    def __init__(self):
+        self.data = array('d')
+
+    @staticmethod
+    def encode(value):
+        return math.nan if value is None else float(value)
+
+    @staticmethod
+    def decode(raw):
+        return None if math.isnan(raw) else raw
+
+    serialize = decode
+
+
+class _DatetimeColumn(_IntColumn):
+    """日時列（1970-01-01 からのマイクロ秒）"""
+
+    def __init__(self):
+        super().__init__('q')
+
+    def encode(self, value):
+        return self.none if value is None else (value - _EPOCH) // _MICROSECOND
+
+    def decode(self, raw):
+        return None if raw == self.none else _EPOCH + raw * _MICROSECOND
+
+    def serialize(self, raw):
+        return None if raw == self.none else (_EPOCH + raw * _MICROSECOND).isoformat()
+
+
+class _CodedStringColumn:
+    """文字列列（値の辞書と符号の配列。天気の種類やアイコンは種類が少ない）"""
+
+    def __init__(self):
+        self.data = array('I')
+        self.values: List[Optional[str]] = [None]
+        self.codes: Dict[Optional[str], int] = {None: 0}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def decode(self, raw):
+        return self.values[raw]
+
+    serialize = decode
+
+
+def _forecast_columns() -> Dict:
+    """FORECAST_FIELDS の順の列"""
+    return {
+        'id': _IntColumn('q'),
+        'location_id': _IntColumn('i'),
+        'forecast_date': _DatetimeColumn(),
+        'weather_main': _CodedStringColumn(),
+        'weather_description': _CodedStringColumn(),
+        'temp_max': _FloatColumn(),
+        'temp_min': _FloatColumn(),
+        'humidity': _IntColumn('i'),
+        'pressure': _IntColumn('i'),
+        'wind_speed': _FloatColumn(),
+        'wind_deg': _IntColumn('i'),
+        'precipitation_probability': _IntColumn('i'),
+        'icon_code': _CodedStringColumn(),
+        'fetched_at': _DatetimeColumn()
+    }
+
+
+class _ForecastTable:
+    """
+    天気予報の列ストア
+
+    各列を array に詰めて1行を同じ添字（スロット）で表し、地域ごとに
+    スロット番号の配列を持つ。行ごとのオブジェクトを作らないため、
+    1行あたりのメモリは列の型の大きさの合計に近くなる。
+    地域の削除で空いたスロットは再利用する。
+    """
+
+    def __init__(self):
+        self.columns = _forecast_columns()
+        self.slots: Dict[int, array] = {}
+        self._free: List[int] = []
+        self._dates = self.columns['forecast_date']
+        self._fetched = self.columns['fetched_at']
+        self._ids = self.columns['id']
+
+    def put(self, values: Sequence, only_newer: bool = False):
+        """
+        FORECAST_FIELDS の順の値を追加・上書き（同一地域・予報日は1行）
+
+        Args:
+            values: 1行分の値
+            only_newer: 既存の行より取得日時が新しい場合のみ上書き
+        """
+        location_id = values[1]
+        date = self._dates.encode(values[2])
+        slots = self.slots.get(location_id)
+        if slots is None:
+            slots = self.slots[location_id] = array('I')
+        for slot in slots:
+            if self._dates.data[slot] == date:
+                if only_newer and self._order_key(slot) > (
+                        self._fetched.encode(values[13]), self._ids.encode(values[0])):
+                    return
+                for column, value in zip(self.columns.values(), values):
+                    column.data[slot] = column.encode(value)
+                return
+
+        if self._free:
+            slot = self._free.pop()
+            for column, value in zip(self.columns.values(), values):
+                column.data[slot] = column.encode(value)
+        else:
+            slot = len(self._ids.data)
+            for column, value in zip(self.columns.values(), values):
+                column.data.append(column.encode(value))
+        slots.append(slot)
+
+    def remove_location(self, location_id: int):
+        """地域の全行を削除"""
+        slots = self.slots.pop(location_id, None)
+        if slots:
+            self._free.extend(slots)
+
+    def find(self, location_id: int, date: datetime = None) -> Optional[int]:
+        """地域・予報日のスロット（予報日がNoneの場合は取得日時が最新の行）"""
+        slots = self.slots.get(location_id)
+        if not slots:
+            return None
+        if date is not None:
+            encoded = self._dates.encode(date)
+            dates = self._dates.data
+            for slot in slots:
+                if dates[slot] == encoded:
+                    return slot
+            return None
+        return max(slots, key=self._order_key)
+
+    def record(self, slot: int) -> ForecastRecord:
+        """スロットの行を読み出す"""
+        return ForecastRecord(*(column.decode(column.data[slot]) for column in self.columns.values()))
+
+    def to_dict(self, slot: int) -> Dict:
+        """スロットの行をモデルの to_dict と同じ形式で読み出す（レコードを作らない）"""
+        return {name: column.serialize(column.data[slot]) for name, column in self.columns.items()}
+
+    def __len__(self):
+        return sum(len(slots) for slots in self.slots.values())
+
+    def nbytes(self) -> int:
+        """列とスロット配列の大きさ（バイト）"""
+        total = sum(c.data.itemsize * len(c.data) for c in self.columns.values())
+        return total + sum(s.itemsize * len(s) for s in self.slots.values())
+
+    def _order_key(self, slot: int):
+        # None は最小値で表すため、datetime.min と同様に最も古い扱いになる
+        return (self._fetched.data[slot], self._ids.data[slot])
+
+
+class ForecastStore:
+    """
+    地域・予報日ごとの最新予報を保持するストア
+
+    起動時にDBから読み込み、DataService の更新系メソッドから
+    ライトスルーで反映される。他プロセスによる更新は data_version の検知を
+    受けて、予報は取得日時が前回以降の行のみ（refresh_forecasts）、
+    地域は地域のみ（load_locations）を読み直す。
+    予報は _ForecastTable の列ストアに保持し、読み込みはDBやORMを介さずに応答する。
+    地域は予報より件数が1桁少ないため、応答形式の辞書のまま保持する。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # location_id -> Location.to_dict() と同じ形式の辞書
+        self._locations: Dict[int, Dict] = {}
+        self._forecasts = _ForecastTable()
+        # 読み込み済みの最新の取得日時（差分読み込みの起点）
+        self._synced_until: Optional[datetime] = None
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        """設定を反映し、有効ならDBから読み込む（アプリケーションコンテキスト内で呼ぶ）"""
+        self.enabled = app.config.get('FORECAST_STORE_ENABLED', False)
+        if self.enabled:
+            self.load()
+
+    def load(self):
+        """DBから全地域と予報を読み込み直す"""
+        locations = self._query_locations()
+        forecasts = _ForecastTable()
+        synced_until = None
+        for row in self._query_forecasts():
+            # 取得日時の昇順で上書きし、同一地域・日付は最新を残す
+            forecasts.put(row)
+            synced_until = row[-1] or synced_until
+        with self._lock:
+            self._locations = locations
+            self._forecasts = forecasts
+            self._synced_until = synced_until
+        logger.info(
+            f"予報ストアを読み込みました: 地域{len(locations)}件, 予報{len(forecasts)}件 "
+            f"（列 {forecasts.nbytes() // 1024}KB）"
+        )
+
+    def load_locations(self):
+        """地域のみ読み込み直し、削除された地域の予報を取り除く"""
+        locations = self._query_locations()
+        with self._lock:
+            self._locations = locations
+            for location_id in [i for i in self._forecasts.slots if i not in locations]:
+                self._forecasts.remove_location(location_id)
+        logger.info(f"予報ストアの地域を読み込み直しました: {len(locations)}件")
+
+    def refresh_forecasts(self) -> int:
+        """
+        前回の読み込み以降に取得された予報のみ読み込む
+
+        Returns:
+            読み込んだ件数
+        """
+        with self._lock:
+            since = self._synced_until
+        if since is None:
+            self.load()
+            return self.stats()['forecasts']
+        # DBの読み込み中は読み込み側を止めないよう、ロックの外で取得する
+        rows = list(self._query_forecasts(since - REFRESH_OVERLAP))
+        synced_until = since
+        with self._lock:
+            for row in rows:
+                self._forecasts.put(row, only_newer=True)
+                synced_until = max(synced_until, row[-1] or synced_until)
+            self._synced_until = synced_until
+        logger.info(f"予報ストアに差分を読み込みました: {len(rows)}件")
+        return len(rows)
+
+    @staticmethod
+    def _query_locations() -> Dict[int, Dict]:
+        return {
+            row[0]: LocationRecord(*row).to_dict()
+            for row in db.session.query(*(getattr(Location, f) for f in LOCATION_FIELDS))
+        }
+
+    @staticmethod
+    def _query_forecasts(since: datetime = None) -> Iterable[Sequence]:
+        """予報を FORECAST_FIELDS の順・取得日時の昇順で取得（since 指定時はそれ以降に取得されたもののみ）"""
+        query = db.session.query(*(getattr(WeatherForecast, f) for f in FORECAST_FIELDS))
+        if since is not None:
+            query = query.filter(WeatherForecast.fetched_at >= since)
+        return query.order_by(WeatherForecast.fetched_at, WeatherForecast.id).yield_per(5000)
+
+    def put_location(self, location: Location):
+        """地域を追加・更新"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._locations[location.id] = LocationRecord.from_object(location).to_dict()
+
+    def remove_location(self, location_id: int):
+        """地域とその予報を削除"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._locations.pop(location_id, None)
+            self._forecasts.remove_location(location_id)
+
+    def put_forecasts(self, forecasts: Iterable[WeatherForecast]):
+        """予報を追加・更新"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for forecast in forecasts:
+                self._forecasts.put([getattr(forecast, field) for field in FORECAST_FIELDS])
+
+    def get_forecast(self, location_id: int, date: datetime = None) -> Optional[ForecastRecord]:
+        """
+        天気予報を取得
+
+        Args:
+            location_id: 地域ID
+            date: 予報日（Noneの場合は取得日時が最新のもの）
+
+        Returns:
+            天気予報レコード
+        """
+        with self._lock:
+            slot = self._forecasts.find(location_id, date)
+            return self._forecasts.record(slot) if slot is not None else None
+
+    def get_forecasts_by_locations(self, location_ids: List[int], date: datetime = None) -> List[Dict]:
+        """
+        複数地域の天気予報を DataService.get_weather_forecasts_by_locations と同じ形式で取得
+        """
+        results = []
+        with self._lock:
+            for location_id in location_ids:
+                location = self._locations.get(location_id)
+                slot = self._forecasts.find(location_id, date) if location else None
+                if slot is not None:
+                    results.append({
+                        'location': dict(location),
+                        'weather': self._forecasts.to_dict(slot)
+                    })
+        return results
+
+    def stats(self) -> Dict:
+        """保持件数と予報の列の大きさを取得"""
+        with self._lock:
+            return {
+                'locations': len(self._locations),
+                'forecasts': len(self._forecasts),
+                'forecast_bytes': self._forecasts.nbytes()
+            }
+
+
+forecast_store = ForecastStore()
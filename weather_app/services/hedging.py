@@ -0,0 +1,183 @@
+"""
+上流API呼び出しのヘッジ（遅い呼び出しの複製送信）
+"""
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+import math
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """ソート済みでない値リストのパーセンタイル（最近傍順位法）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class HedgePolicy:
+    """
+    ヘッジ付き呼び出し
+
+    直近の上流レイテンシの percentile パーセンタイル（min_delay 以上）を
+    過ぎても応答が無い場合に同じ呼び出しをもう1本送り、先に成功した方を採用する。
+    ヘッジ数は直近 window 件の呼び出しの budget 割合までに制限し、
+    レイテンシ標本が min_samples 件に満たない間はヘッジしない。
+
+    負けた呼び出しには cancel イベントを通知する。requests は応答待ちの
+    ソケットを中断できないため、attempt 側で応答ヘッダー受信後に本文を
+    読まずに接続を閉じ、結果は破棄する。
+    """
+
+    def __init__(self, name: str, enabled: bool = False, percentile: float = 95,
+                 min_delay: float = 0.05, budget: float = 0.05, min_samples: int = 20,
+                 window: int = 200):
+        self.name = name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.budget = budget
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._recent_calls: Deque[bool] = deque(maxlen=window)
+        self._call_latencies: Deque[float] = deque(maxlen=window)
+        self._counters = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'budget_denied': 0}
+        self._hedges_in_flight = 0
+        self._lock = threading.Lock()
+
+    def call(self, attempt: Callable[[threading.Event], object]):
+        """
+        attempt をヘッジ付きで実行
+
+        Args:
+            attempt: cancel イベントを受け取り結果を返す関数（別スレッドで実行）
+
+        Returns:
+            最初に成功した attempt の結果
+
+        Raises:
+            すべての attempt が失敗した場合は最初の例外
+        """
+        if not self.enabled:
+            started = time.monotonic()
+            result = attempt(threading.Event())
+            elapsed = time.monotonic() - started
+            self._record_latency(elapsed)
+            self._finish_call(elapsed, False, False)
+            return result
+
+        started = time.monotonic()
+        delay = self.hedge_delay()
+        results: queue.Queue = queue.Queue()
+        cancels = [self._start(0, attempt, results)]
+        hedged = False
+
+        try:
+            first = results.get(timeout=delay) if delay is not None else results.get()
+        except queue.Empty:
+            hedged = self._acquire_hedge()
+            if hedged:
+                logger.info(f"上流の応答が遅いためヘッジを送信しました: {self.name}（{delay * 1000:.0f}ms経過）")
+                cancels.append(self._start(1, attempt, results))
+            first = results.get()
+
+        error = None
+        pending = len(cancels)
+        outcome = first
+        while True:
+            index, ok, value = outcome
+            pending -= 1
+            if ok:
+                for other, cancel in enumerate(cancels):
+                    if other != index:
+                        cancel.set()
+                self._finish_call(time.monotonic() - started, hedged, hedged and index == 1)
+                return value
+            if error is None:
+                error = value
+            if pending == 0:
+                break
+            outcome = results.get()
+
+        self._finish_call(time.monotonic() - started, hedged, False)
+        raise error
+
+    def hedge_delay(self) -> Optional[float]:
+        """ヘッジを送るまでの待ち時間（標本不足時はNone）"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            samples = list(self._latencies)
+        return max(self.min_delay, percentile(samples, self.percentile))
+
+    def stats(self) -> Dict:
+        """ヘッジの件数と呼び出し側から見たレイテンシ（ms）"""
+        with self._lock:
+            counters = dict(self._counters)
+            call_latencies = list(self._call_latencies)
+            upstream = list(self._latencies)
+        delay = self.hedge_delay()
+        return {
+            'enabled': self.enabled,
+            **counters,
+            'hedge_rate': round(counters['hedged'] / counters['calls'], 4) if counters['calls'] else 0.0,
+            'hedge_delay_ms': round(delay * 1000, 1) if delay is not None else None,
+            'latency_ms': {
+                f"p{pct}": round(value * 1000, 1) if value is not None else None
+                for pct, value in (
+                    (50, percentile(call_latencies, 50)),
+                    (95, percentile(call_latencies, 95)),
+                    (99, percentile(call_latencies, 99))
+                )
+            },
+            'upstream_p99_ms': round(percentile(upstream, 99) * 1000, 1) if upstream else None
+        }
+
+    def _start(self, index: int, attempt, results: queue.Queue) -> threading.Event:
+        """attempt を別スレッドで開始"""
+        cancel = threading.Event()
+
+        def run():
+            started = time.monotonic()
+            try:
+                value = attempt(cancel)
+            except Exception as e:
+                results.put((index, False, e))
+                return
+            # 負けた呼び出しも上流の実レイテンシとして標本に含める
+            self._record_latency(time.monotonic() - started)
+            results.put((index, True, value))
+
+        threading.Thread(target=run, name=f"hedge-{self.name}-{index}", daemon=True).start()
+        return cancel
+
+    def _acquire_hedge(self) -> bool:
+        """予算内ならヘッジ枠を確保"""
+        with self._lock:
+            hedges = sum(1 for hedged in self._recent_calls if hedged) + self._hedges_in_flight
+            if hedges + 1 > self.budget * max(len(self._recent_calls), 1):
+                self._counters['budget_denied'] += 1
+                return False
+            self._hedges_in_flight += 1
+            return True
+
+    def _finish_call(self, elapsed: float, hedged: bool, hedge_won: bool):
+        with self._lock:
+            self._recent_calls.append(hedged)
+            self._call_latencies.append(elapsed)
+            self._counters['calls'] += 1
+            if hedged:
+                self._hedges_in_flight -= 1
+                self._counters['hedged'] += 1
+            if hedge_won:
+                self._counters['hedge_wins'] += 1
+
+    def _record_latency(self, elapsed: float):
+        with self._lock:
+            self._latencies.append(elapsed)
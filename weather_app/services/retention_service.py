@@ -0,0 +1,142 @@
+"""
+天気予報の保持期間管理サービス
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from models import db
+from models.location import Location
+from models.weather import WeatherForecast
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 保持期間の区分
+TIER_FAVORITE = 'favorite'
+TIER_PRESET = 'preset'
+TIER_DEFAULT = 'default'
+
+
+class RetentionService:
+    """
+    古い天気予報を区分別の保持期間で分割削除する
+
+    (location_id, fetched_at) インデックスの範囲検索で対象行を絞り込み、
+    chunk_size 件ずつ短いトランザクションで削除する。1回の書き込みロック保持時間が
+    チャンク1件分に収まるため、読み込みを長時間待たせない。
+    """
+
+    def __init__(self, retention_days: Dict[str, int], preset_names: List[str],
+                 chunk_size: int = 500, pause: float = 0.0):
+        self.retention_days = retention_days
+        self.preset_names = set(preset_names)
+        self.chunk_size = chunk_size
+        # チャンク間で読み手に譲る待機時間（秒）
+        self.pause = pause
+
+    def classify_locations(self) -> Dict[str, List[int]]:
+        """
+        地域を保持期間の区分に分類
+
+        Returns:
+            区分名をキーとする地域IDリストの辞書
+        """
+        tiers = {TIER_FAVORITE: [], TIER_PRESET: [], TIER_DEFAULT: []}
+        rows = db.session.query(Location.id, Location.name, Location.is_favorite).all()
+        for location_id, name, is_favorite in rows:
+            if is_favorite:
+                tiers[TIER_FAVORITE].append(location_id)
+            elif name in self.preset_names:
+                tiers[TIER_PRESET].append(location_id)
+            else:
+                tiers[TIER_DEFAULT].append(location_id)
+        return tiers
+
+    def purge(self, now: Optional[datetime] = None, default_days: Optional[int] = None) -> Dict:
+        """
+        保持期間を過ぎた天気予報を削除
+
+        Args:
+            now: 基準時刻（Noneの場合は現在時刻）
+            default_days: 通常区分の保持日数を上書きする場合に指定
+
+        Returns:
+            削除件数・チャンク数・所要時間を含む結果
+        """
+        started = time.perf_counter()
+        now = now or datetime.utcnow()
+        tiers = self.classify_locations()
+
+        by_tier = {}
+        chunks = 0
+        max_chunk_ms = 0.0
+        for tier, location_ids in tiers.items():
+            days = self.retention_days.get(tier, self.retention_days.get(TIER_DEFAULT, 7))
+            if tier == TIER_DEFAULT and default_days is not None:
+                days = default_days
+            cutoff = now - timedelta(days=days)
+
+            deleted = 0
+            for start in range(0, len(location_ids), self.chunk_size):
+                id_batch = location_ids[start:start + self.chunk_size]
+                while True:
+                    chunk_started = time.perf_counter()
+                    count = self._delete_chunk(id_batch, cutoff)
+                    max_chunk_ms = max(max_chunk_ms, (time.perf_counter() - chunk_started) * 1000)
+                    if count == 0:
+                        break
+                    chunks += 1
+                    deleted += count
+                    if count < self.chunk_size:
+                        break
+                    if self.pause:
+                        time.sleep(self.pause)
+            by_tier[tier] = {'retention_days': days, 'deleted': deleted}
+
+        total = sum(item['deleted'] for item in by_tier.values())
+        result = {
+            'deleted': total,
+            'chunks': chunks,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+            'max_chunk_ms': round(max_chunk_ms, 2),
+            'by_tier': by_tier
+        }
+        logger.info(
+            f"古い天気予報を削除しました: {total}件 "
+            f"({chunks}チャンク, {result['elapsed_ms']}ms, 最大{result['max_chunk_ms']}ms/チャンク)"
+        )
+        return result
+
+    def _delete_chunk(self, location_ids: List[int], cutoff: datetime) -> int:
+        """
+        保持期限切れの行を最大chunk_size件削除
+
+        Args:
+            location_ids: 対象の地域ID
+            cutoff: この時刻より前に取得した予報を削除
+
+        Returns:
+            削除件数
+        """
+        ids = [row.id for row in self._expired_ids_query(location_ids, cutoff)]
+        if not ids:
+            db.session.rollback()
+            return 0
+        WeatherForecast.query.filter(
+            WeatherForecast.id.in_(ids)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return len(ids)
+
+    def _expired_ids_query(self, location_ids: List[int], cutoff: datetime):
+        """
+        削除対象IDを最大chunk_size件取得するクエリ
+
+        全件消すため順序は問わない。ORDER BY を付けると地域をまたいだ
+        並び替え（SQLiteでは TEMP B-TREE）が必要になるため付けず、
+        (location_id, fetched_at) インデックスの範囲検索だけで完結させる。
+        """
+        return db.session.query(WeatherForecast.id).filter(
+            WeatherForecast.location_id.in_(location_ids),
+            WeatherForecast.fetched_at < cutoff
+        ).limit(self.chunk_size)
@@ -0,0 +1,425 @@
+"""
+複数ノード共有キャッシュサービス
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse, unquote
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# 単一フライトロック待機時のポーリング間隔（秒）
+LOCK_POLL_INTERVAL = 0.05
+
+# 期限切れエントリ・残ったロックファイルを掃除する間隔（秒）
+SWEEP_INTERVAL = 300
+
+# 書き込み途中で残った一時ファイルを削除するまでの猶予（秒）
+STALE_TMP_SECONDS = 60
+
+
+class SharedCacheBackend(ABC):
+    """
+    共有キャッシュのバックエンド基底クラス
+
+    値はJSONシリアライズ可能なオブジェクトに限る。
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """値を取得（期限切れ・未登録はNone）"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: int):
+        """値をTTL付きで保存"""
+
+    @abstractmethod
+    def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        """
+        ノード間ロックを取得
+
+        Args:
+            key: ロックキー
+            ttl: ロック保持上限（秒）。取得ノードが落ちても自動解放される
+                （OSがロックを解放するバックエンドでは使わない）
+
+        Returns:
+            解放用トークン、取得できなければNone
+        """
+
+    @abstractmethod
+    def release_lock(self, key: str, token: str):
+        """自分が取得したロックのみ解放"""
+
+    def get_or_fetch(self, key: str, ttl: int, fetch: Callable[[], Any],
+                     lock_timeout: float = 15.0) -> Any:
+        """
+        キャッシュを参照し、未登録なら1ノードだけが取得を実行する
+
+        他ノードがロック保持中は、そのノードの結果が書き込まれるまで待つ。
+        lock_timeout を過ぎても結果が現れない場合は自分で取得する。
+
+        Args:
+            key: キャッシュキー
+            ttl: 有効期限（秒）
+            fetch: キャッシュミス時に値を取得する関数
+            lock_timeout: ロック保持上限兼待機上限（秒）
+
+        Returns:
+            キャッシュ済みまたは取得した値
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        lock_key = f"lock:{key}"
+        deadline = time.monotonic() + lock_timeout
+        while True:
+            token = self.acquire_lock(lock_key, lock_timeout)
+            if token:
+                try:
+                    # ロック待ちの間に他ノードが書き込んでいれば再利用
+                    value = self.get(key)
+                    if value is not None:
+                        return value
+                    value = fetch()
+                    if value is not None:
+                        self.set(key, value, ttl)
+                    return value
+                finally:
+                    self.release_lock(lock_key, token)
+
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = self.get(key)
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                logger.warning(f"共有キャッシュのロック待機がタイムアウト: {key}")
+                return fetch()
+
+
+class MemoryCacheBackend(SharedCacheBackend):
+    """プロセス内キャッシュ（単一ノード・テスト用）"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[float, Any]] = {}
+        self._locks: Dict[str, Tuple[float, str]] = {}
+        self._mutex = threading.Lock()
+        self._swept_at = time.monotonic()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._mutex:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: Any, ttl: int):
+        with self._mutex:
+            self._data[key] = (time.time() + ttl, value)
+            if time.monotonic() - self._swept_at >= SWEEP_INTERVAL:
+                self._sweep()
+
+    def _sweep(self):
+        """期限切れのエントリとロックを削除（ロック取得済みで呼ぶこと）"""
+        now = time.time()
+        self._swept_at = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+        for key in [k for k, (expires_at, _) in self._locks.items() if expires_at <= now]:
+            del self._locks[key]
+
+    def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        now = time.time()
+        with self._mutex:
+            held = self._locks.get(key)
+            if held and held[0] > now:
+                return None
+            token = uuid.uuid4().hex
+            self._locks[key] = (now + ttl, token)
+            return token
+
+    def release_lock(self, key: str, token: str):
+        with self._mutex:
+            held = self._locks.get(key)
+            if held and held[1] == token:
+                del self._locks[key]
+
+
+def _try_lock_fd(fd: int) -> bool:
+    """ファイルの排他ロックを待たずに取得（保持プロセスが終了するとOSが解放する）"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock_fd(fd: int):
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    except OSError:
+        pass
+
+
+class FileCacheBackend(SharedCacheBackend):
+    """
+    共有ディレクトリ上のファイルキャッシュ
+
+    同一ホスト上の複数インスタンス、またはネットワークファイルシステムを
+    共有するノード間で利用できる。ロックはロックファイルに対する
+    OSの排他ロック（flock、Windowsは msvcrt.locking）で表現する。
+    保持プロセスが落ちるとOSが解放するため、期限切れのロックを奪い合う
+    必要が無く、acquire_lock の ttl は使わない。ロックファイルは解放時に
+    削除するため、削除済みのファイルをロックした場合は取得失敗として扱う。
+    期限切れのエントリ、保持プロセスが落ちて残ったロックファイル、
+    書き込み途中で残った一時ファイルは、set 時に sweep_interval 秒に1回まとめて削除する。
+    """
+
+    def __init__(self, directory: str, sweep_interval: float = SWEEP_INTERVAL):
+        self.directory = directory
+        self.sweep_interval = sweep_interval
+        self._swept_at = 0.0
+        self._sweep_lock = threading.Lock()
+        # トークン -> ロック中のファイルディスクリプタ
+        self._held: Dict[str, int] = {}
+        self._held_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, suffix: str) -> str:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{digest}{suffix}")
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._path(key, '.json'), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('expires_at', 0) <= time.time():
+            return None
+        return entry.get('value')
+
+    def set(self, key: str, value: Any, ttl: int):
+        entry = {'expires_at': time.time() + ttl, 'value': value}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            # 読み手が書きかけのファイルを見ないよう置換で反映
+            os.replace(tmp_path, self._path(key, '.json'))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if time.monotonic() - self._swept_at >= self.sweep_interval:
+            self.sweep()
+
+    def sweep(self) -> int:
+        """
+        期限切れのエントリ、保持されていないロックファイル、古い一時ファイルを削除
+
+        他ノードと同時に実行しても、消えるのは期限切れのエントリと
+        誰もロックしていないロックファイルのみ。
+
+        Returns:
+            削除したファイル数
+        """
+        if not self._sweep_lock.acquire(blocking=False):
+            return 0
+        removed = 0
+        try:
+            self._swept_at = time.monotonic()
+            now = time.time()
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.endswith('.lock'):
+                    removed += self._remove_unheld_lock(path)
+                    continue
+                if name.endswith('.json'):
+                    expired = self._entry_expired(path, now)
+                elif name.endswith('.tmp'):
+                    try:
+                        expired = os.path.getmtime(path) + STALE_TMP_SECONDS < now
+                    except OSError:
+                        expired = False
+                else:
+                    continue
+                if expired:
+                    try:
+                        os.remove(path)
+                        removed += 1
+                    except OSError:
+                        pass
+        finally:
+            self._sweep_lock.release()
+        if removed:
+            logger.info(f"共有キャッシュを掃除しました: {removed}件")
+        return removed
+
+    def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        path = self._path(key, '.lock')
+        fd = self._lock_file(path, create=True)
+        if fd is None:
+            return None
+        token = uuid.uuid4().hex
+        with self._held_lock:
+            self._held[token] = fd
+        return token
+
+    def release_lock(self, key: str, token: str):
+        with self._held_lock:
+            fd = self._held.pop(token, None)
+        if fd is None:
+            return
+        # ロック中に削除し、次の取得者は新しいファイルを作る
+        try:
+            os.remove(self._path(key, '.lock'))
+        except OSError:
+            # Windows では開いているファイルを削除できないため残す（sweep で削除）
+            pass
+        _unlock_fd(fd)
+        os.close(fd)
+
+    @staticmethod
+    def _lock_file(path: str, create: bool) -> Optional[int]:
+        """
+        ロックファイルを開いて排他ロックを取得
+
+        ロック取得までの間に他ノードが削除・作成し直した場合は、
+        開いたファイルがパスの指すファイルと異なるため失敗として扱う。
+
+        Returns:
+            ロック中のファイルディスクリプタ、取得できなければNone
+        """
+        flags = os.O_RDWR | (os.O_CREAT if create else 0)
+        try:
+            fd = os.open(path, flags)
+        except OSError:
+            return None
+        if _try_lock_fd(fd):
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    return fd
+            except OSError:
+                pass
+            _unlock_fd(fd)
+        os.close(fd)
+        return None
+
+    def _remove_unheld_lock(self, path: str) -> int:
+        """誰も保持していないロックファイルを、自分でロックしてから削除"""
+        fd = self._lock_file(path, create=False)
+        if fd is None:
+            return 0
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+        finally:
+            _unlock_fd(fd)
+            os.close(fd)
+
+    @staticmethod
+    def _entry_expired(path: str, now: float) -> bool:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('expires_at', 0) <= now
+        except ValueError:
+            # 置換で書き込むため壊れたファイルは残骸
+            return True
+        except OSError:
+            return False
+
+
+class RedisCacheBackend(SharedCacheBackend):
+    """Redisプロトコル対応キャッシュ（redisパッケージが必要）"""
+
+    # 自分のトークンの場合のみ削除する（他ノードのロックを誤って解放しない）
+    _RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url: str, prefix: str = 'weather:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("Redisバックエンドには redis パッケージが必要です (pip install redis)") from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._release = self.client.register_script(self._RELEASE_SCRIPT)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: int):
+        self.client.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=int(ttl))
+
+    def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if self.client.set(self.prefix + key, token, nx=True, px=int(ttl * 1000)):
+            return token
+        return None
+
+    def release_lock(self, key: str, token: str):
+        self._release(keys=[self.prefix + key], args=[token])
+
+
+def create_shared_cache(url: Optional[str]) -> Optional[SharedCacheBackend]:
+    """
+    URLから共有キャッシュバックエンドを生成
+
+    Args:
+        url: memory:// / file:///path/to/dir / redis://host:6379/0
+            空の場合は共有キャッシュを使わない
+
+    Returns:
+        バックエンド、未設定時はNone
+
+    Raises:
+        ValueError: 未対応のスキームの場合
+    """
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == 'memory':
+        return MemoryCacheBackend()
+    if parsed.scheme == 'file':
+        # file://relative/dir のようにnetlocへ入った場合も許容
+        path = unquote(parsed.netloc + parsed.path)
+        return FileCacheBackend(path)
+    if parsed.scheme in ('redis', 'rediss', 'unix'):
+        return RedisCacheBackend(url)
+    raise ValueError(f"未対応の共有キャッシュURLです: {url}")
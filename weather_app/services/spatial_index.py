@@ -0,0 +1,218 @@
+"""
+地域座標の空間インデックス
+"""
+from typing import Dict, List, Optional, Set, Tuple
+from models import db
+from models.location import Location
+import math
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """2点間の大円距離（km）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    """
+    緯度経度の等間隔グリッドによる空間インデックス
+
+    地域を cell_degrees 四方のセルに振り分け、範囲検索は該当セルのみ、
+    近傍検索は中心セルから外側へリング状に広げて走査する。
+    地域の追加・削除はセル1つの更新で済む。
+    """
+
+    def __init__(self, cell_degrees: float = 1.0):
+        self.cell_degrees = cell_degrees
+        self._points: Dict[int, Tuple[float, float]] = {}
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        """設定を反映しDBから構築（アプリケーションコンテキスト内で呼ぶ）"""
+        self.cell_degrees = app.config.get('SPATIAL_CELL_DEGREES', self.cell_degrees)
+        self.rebuild()
+
+    def rebuild(self):
+        """DBの全地域から作り直す"""
+        rows = db.session.query(Location.id, Location.lat, Location.lon).filter(
+            Location.lat.isnot(None), Location.lon.isnot(None)
+        ).all()
+        with self._lock:
+            self._points.clear()
+            self._cells.clear()
+            for location_id, lat, lon in rows:
+                self.add(location_id, lat, lon)
+        logger.info(f"空間インデックスを構築しました: {len(rows)}件")
+
+    def add(self, location_id: int, lat: Optional[float], lon: Optional[float]):
+        """地域を追加（座標が無い地域は対象外）"""
+        if lat is None or lon is None:
+            return
+        with self._lock:
+            self.remove(location_id)
+            self._points[location_id] = (lat, lon)
+            self._cells.setdefault(self._cell(lat, lon), set()).add(location_id)
+
+    def remove(self, location_id: int):
+        """地域を削除"""
+        with self._lock:
+            point = self._points.pop(location_id, None)
+            if point is None:
+                return
+            cell = self._cell(*point)
+            ids = self._cells.get(cell)
+            if ids is not None:
+                ids.discard(location_id)
+                if not ids:
+                    del self._cells[cell]
+
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                    limit: Optional[int] = None) -> List[int]:
+        """
+        矩形範囲内の地域IDを取得
+
+        Args:
+            min_lat: 南端の緯度
+            min_lon: 西端の経度（max_lonより大きい場合は日付変更線をまたぐ範囲）
+            max_lat: 北端の緯度
+            max_lon: 東端の経度
+            limit: 最大件数
+
+        Returns:
+            地域IDのリスト
+        """
+        if min_lon > max_lon:
+            spans = [(min_lon, 180.0), (-180.0, max_lon)]
+        else:
+            spans = [(min_lon, max_lon)]
+
+        results = []
+        with self._lock:
+            # 範囲が広くセル数が地域数を上回る場合は全件走査の方が速い
+            cell_count = sum(
+                (self._cell_index(hi) - self._cell_index(lo) + 1) for lo, hi in spans
+            ) * (self._cell_index(max_lat) - self._cell_index(min_lat) + 1)
+            if cell_count > len(self._cells):
+                candidates = self._points.items()
+            else:
+                # 経度180度のセルは-180度側に寄せるため、両方の範囲で同じセルが出うる
+                cells = {
+                    cell for lo, hi in spans
+                    for cell in self._cells_in_range(min_lat, lo, max_lat, hi)
+                }
+                candidates = (
+                    (location_id, self._points[location_id])
+                    for cell in cells
+                    for location_id in self._cells.get(cell, ())
+                )
+            for location_id, (lat, lon) in candidates:
+                if min_lat <= lat <= max_lat and any(lo <= lon <= hi for lo, hi in spans):
+                    results.append(location_id)
+                    if limit and len(results) >= limit:
+                        break
+        return results
+
+    def nearest(self, lat: float, lon: float, limit: int = 5,
+                max_distance_km: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        近い順に地域を取得
+
+        Args:
+            lat: 緯度
+            lon: 経度
+            limit: 最大件数
+            max_distance_km: 検索半径（km）
+
+        Returns:
+            (地域ID, 距離km) のリスト
+        """
+        with self._lock:
+            if not self._points:
+                return []
+            center_row = self._cell_index(lat)
+            center_col = self._cell_index(lon)
+            max_ring = int(math.ceil(180 / self.cell_degrees))
+
+            found: List[Tuple[float, int]] = []
+            for ring in range(max_ring + 1):
+                for cell in self._ring_cells(center_row, center_col, ring):
+                    for location_id in self._cells.get(cell, ()):
+                        p_lat, p_lon = self._points[location_id]
+                        distance = haversine_km(lat, lon, p_lat, p_lon)
+                        if max_distance_km is None or distance <= max_distance_km:
+                            found.append((distance, location_id))
+
+                # 次のリングに含まれる点は少なくともこの距離だけ離れている
+                bound = self._ring_lower_bound_km(lat, ring)
+                if max_distance_km is not None and bound > max_distance_km:
+                    break
+                if len(found) >= limit and sorted(found)[limit - 1][0] <= bound:
+                    break
+                if len(found) >= len(self._points):
+                    break
+
+        found.sort()
+        return [(location_id, round(distance, 3)) for distance, location_id in found[:limit]]
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell_index(self, degrees: float) -> int:
+        return int(math.floor(degrees / self.cell_degrees))
+
+    def _wrap_col(self, col: int) -> int:
+        """経度方向のセル番号を [-180, 180) の範囲に周回させる"""
+        cols_per_world = int(round(360 / self.cell_degrees))
+        min_col = self._cell_index(-180.0)
+        return (col - min_col) % cols_per_world + min_col
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (self._cell_index(lat), self._wrap_col(self._cell_index(lon)))
+
+    def _cells_in_range(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+        for row in range(self._cell_index(min_lat), self._cell_index(max_lat) + 1):
+            for col in range(self._cell_index(min_lon), self._cell_index(max_lon) + 1):
+                yield (row, self._wrap_col(col))
+
+    def _ring_cells(self, row: int, col: int, ring: int):
+        """中心セルから ring 個離れた正方形の外周セル（経度は周回させる）"""
+        wrap = self._wrap_col
+
+        if ring == 0:
+            yield (row, wrap(col))
+            return
+        seen = set()
+        for dc in range(-ring, ring + 1):
+            for dr in (-ring, ring):
+                cell = (row + dr, wrap(col + dc))
+                if cell not in seen:
+                    seen.add(cell)
+                    yield cell
+        for dr in range(-ring + 1, ring):
+            for dc in (-ring, ring):
+                cell = (row + dr, wrap(col + dc))
+                if cell not in seen:
+                    seen.add(cell)
+                    yield cell
+
+    def _ring_lower_bound_km(self, lat: float, ring: int) -> float:
+        """ring までのセルの外側にある点までの最短距離の下限（km）"""
+        # 経度方向は高緯度ほど縮むため、検索範囲内で最も縮む緯度で見積もる
+        reach_deg = ring * self.cell_degrees
+        extreme_lat = min(90.0, abs(lat) + reach_deg + self.cell_degrees)
+        km_per_deg_lat = math.pi * EARTH_RADIUS_KM / 180
+        km_per_deg_lon = km_per_deg_lat * math.cos(math.radians(extreme_lat))
+        return reach_deg * min(km_per_deg_lat, km_per_deg_lon)
+
+
+spatial_index = SpatialIndex()
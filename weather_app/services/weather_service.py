@@ -4,6 +4,10 @@ OpenWeatherMap API連携サービス
 import requests
 from datetime import datetime, timedelta, time
 from typing import Optional, Dict, List
+from services.shared_cache import SharedCacheBackend, create_shared_cache
+from services.circuit_breaker import CircuitBreaker
+from services.hedging import HedgePolicy
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,14 +16,111 @@ class WeatherAPIError(Exception):
     """天気APIエラー"""
     pass
 
+class CircuitOpenError(WeatherAPIError):
+    """上流障害によりサーキットが開いている"""
+    pass
+
 class WeatherService:
     """天気データ取得サービス"""
     
-    def __init__(self, api_key: str, base_url: str, timeout: int = 10):
+    def __init__(self, api_key: str, base_url: str, timeout: int = 10,
+                 cache: Optional[SharedCacheBackend] = None,
+                 cache_ttl: int = 1800, geocode_cache_ttl: int = 86400,
+                 breaker_options: Optional[Dict] = None,
+                 hedge_options: Optional[Dict] = None):
         self.api_key = api_key
         self.base_url = base_url
         self.timeout = timeout
         self.geo_url = "http://api.openweathermap.org/geo/1.0"
+        # 複数ノードで上流呼び出しを共有するキャッシュ（Noneなら毎回取得）
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.geocode_cache_ttl = geocode_cache_ttl
+        # エンドポイントごとのサーキットブレーカー
+        breaker_options = breaker_options or {}
+        self.breakers = {
+            'forecast': CircuitBreaker('forecast', **breaker_options),
+            'geocode': CircuitBreaker('geocode', **breaker_options)
+        }
+        # 遅い呼び出しに複製を送るヘッジ（予報取得のみ。検索は対話的で件数も少ない）
+        self.hedge = HedgePolicy('forecast', **(hedge_options or {}))
+    
+    def _request(self, endpoint: str, url: str, params: Dict):
+        """
+        サーキットブレーカー経由で上流APIを呼び出す
+        
+        タイムアウト・接続エラー・429・5xxのみを上流障害として数え、
+        401/404 等の呼び出し側の問題ではサーキットを開かない。
+        
+        Args:
+            endpoint: ブレーカー名（forecast / geocode）
+            url: URL
+            params: クエリパラメータ
+            
+        Returns:
+            レスポンスJSON
+            
+        Raises:
+            CircuitOpenError: サーキットが開いている場合
+        """
+        breaker = self.breakers[endpoint]
+        if not breaker.allow_request():
+            raise CircuitOpenError(
+                f"天気APIが応答していないため取得を中止しました"
+                f"（約{int(breaker.remaining_open_seconds())}秒後に再試行）"
+            )
+        try:
+            if endpoint == 'forecast':
+                data = self.hedge.call(lambda cancel: self._get_json(url, params, cancel))
+            else:
+                data = self._get_json(url, params)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            breaker.record_failure()
+            raise
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else 0
+            if status == 429 or status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.release()
+            raise
+        except Exception:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return data
+    
+    def _get_json(self, url: str, params: Dict, cancel: Optional[threading.Event] = None):
+        """
+        GETしてJSONを返す
+        
+        ヘッジで負けた場合（cancel がセット済み）は本文を読まずに接続を閉じる
+        """
+        with requests.get(url, params=params, timeout=self.timeout, stream=True) as response:
+            if cancel is not None and cancel.is_set():
+                return None
+            response.raise_for_status()
+            return response.json()
+    
+    def _cached(self, key: str, ttl: int, fetch):
+        """共有キャッシュがあれば単一フライトで取得、なければ直接取得"""
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch(key, ttl, fetch, lock_timeout=self.timeout + 5)
+    
+    @classmethod
+    def from_config(cls, config) -> 'WeatherService':
+        """設定クラスからインスタンスを生成"""
+        return cls(
+            api_key=config.OPENWEATHER_API_KEY,
+            base_url=config.OPENWEATHER_BASE_URL,
+            timeout=config.API_TIMEOUT,
+            cache=create_shared_cache(config.SHARED_CACHE_URL),
+            cache_ttl=config.CACHE_DURATION,
+            geocode_cache_ttl=config.GEOCODE_CACHE_DURATION,
+            breaker_options=config.CIRCUIT_BREAKER_OPTIONS,
+            hedge_options=config.HEDGE_OPTIONS
+        )
     
     def get_tomorrow_forecast(self, location_name: str, country_code: str = 'JP') -> Optional[Dict]:
         """
@@ -32,6 +133,25 @@ class WeatherService:
         Returns:
             天気予報データ、エラー時はNone
         """
+        data = self.get_forecast_response(location_name, country_code)
+        try:
+            # 明日のデータを抽出
+            return self.extract_tomorrow_data(data)
+        except Exception as e:
+            logger.error(f"予期しないエラー: {e}")
+            raise WeatherAPIError(f"予期しないエラーが発生しました: {e}")
+    
+    def get_forecast_response(self, location_name: str, country_code: str = 'JP') -> Dict:
+        """
+        5日間予報の生レスポンスを取得
+        
+        Args:
+            location_name: 地域名
+            country_code: 国コード
+            
+        Returns:
+            OpenWeatherMap APIレスポンス
+        """
         try:
             # APIエンドポイント
             url = f"{self.base_url}/forecast"
@@ -46,16 +166,12 @@ class WeatherService:
                 'cnt': 40
             }
             
-            logger.info(f"天気データを取得中: {location_name}")
-            response = requests.get(url, params=params, timeout=self.timeout)
-            response.raise_for_status()
-            
-            data = response.json()
+            def fetch():
+                logger.info(f"天気データを取得中: {location_name}")
+                return self._request('forecast', url, params)
             
-            # 明日のデータを抽出
-            tomorrow_data = self._extract_tomorrow_data(data)
-            
-            return tomorrow_data
+            # 「明日」は呼び出し時刻で変わるため、抽出前の生レスポンスを共有する
+            return self._cached(f"forecast:{location_name},{country_code}", self.cache_ttl, fetch)
             
         except requests.exceptions.Timeout:
             logger.error(f"APIタイムアウト: {location_name}")
@@ -73,14 +189,19 @@ class WeatherService:
             else:
                 logger.error(f"APIエラー: {e}")
                 raise WeatherAPIError(f"APIエラーが発生しました: {e}")
+        except WeatherAPIError:
+            raise
         except Exception as e:
             logger.error(f"予期しないエラー: {e}")
             raise WeatherAPIError(f"予期しないエラーが発生しました: {e}")
     
-    def _extract_tomorrow_data(self, api_response: Dict) -> Dict:
+    @staticmethod
+    def extract_tomorrow_data(api_response: Dict) -> Dict:
         """
         APIレスポンスから明日のデータを抽出
         
+        インスタンスの状態を使わないため、別プロセスでも実行できる
+        
         Args:
             api_response: OpenWeatherMap APIレスポンス
             
@@ -178,25 +299,25 @@ class WeatherService:
                 'appid': self.api_key
             }
             
-            logger.info(f"地域を検索中: {query}")
-            response = requests.get(url, params=params, timeout=self.timeout)
-            response.raise_for_status()
-            
-            results = response.json()
-            
-            # 結果を整形
-            formatted_results = []
-            for item in results:
-                formatted_results.append({
-                    'name': item.get('name', ''),
-                    'local_names': item.get('local_names', {}),
-                    'lat': item.get('lat'),
-                    'lon': item.get('lon'),
-                    'country': item.get('country', ''),
-                    'state': item.get('state', '')
-                })
+            def fetch():
+                logger.info(f"地域を検索中: {query}")
+                results = self._request('geocode', url, params)
+                
+                # 結果を整形
+                formatted_results = []
+                for item in results:
+                    formatted_results.append({
+                        'name': item.get('name', ''),
+                        'local_names': item.get('local_names', {}),
+                        'lat': item.get('lat'),
+                        'lon': item.get('lon'),
+                        'country': item.get('country', ''),
+                        'state': item.get('state', '')
+                    })
+                
+                return formatted_results
             
-            return formatted_results
+            return self._cached(f"geocode:{query.lower()}:{limit}", self.geocode_cache_ttl, fetch)
             
         except requests.exceptions.Timeout:
             logger.error(f"検索タイムアウト: {query}")
@@ -204,6 +325,8 @@ class WeatherService:
         except requests.exceptions.HTTPError as e:
             logger.error(f"検索APIエラー: {e}")
             raise WeatherAPIError(f"検索エラーが発生しました: {e}")
+        except WeatherAPIError:
+            raise
         except Exception as e:
             logger.error(f"予期しないエラー: {e}")
             raise WeatherAPIError(f"予期しないエラーが発生しました: {e}")
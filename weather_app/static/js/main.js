@@ -6,17 +6,26 @@ let selectedLocationIds = [];
 let allLocations = [];
 let searchDebounceTimer = null;
 
+// 再訪問時に前回の選択地域と予報を復元するためのキー
+const SELECTED_IDS_STORAGE_KEY = 'selectedLocationIds';
+
 /**
  * 初期化
  */
 async function init() {
     try {
+        // 前回の選択地域を復元
+        selectedLocationIds = loadSelectedLocationIds();
+        
         // 地域リストを取得
         await loadLocations();
         
         // イベントリスナー設定
         setupEventListeners();
         
+        // 前回表示した予報を保存済みデータから即座に描画
+        await restoreLastForecasts();
+        
         showNotification('アプリケーションを起動しました', 'success');
     } catch (error) {
         console.error('Initialization error:', error);
@@ -29,8 +38,15 @@ async function init() {
  */
 async function loadLocations() {
     try {
-        const data = await apiRequest('/api/locations');
+        const data = await cachedApiRequest('/api/locations', {
+            onUpdate: (latest) => {
+                allLocations = latest.data;
+                displayLocationList(allLocations);
+            }
+        });
         allLocations = data.data;
+        // 削除済みの地域を選択状態から除外
+        selectedLocationIds = selectedLocationIds.filter(id => allLocations.some(loc => loc.id === id));
         displayLocationList(allLocations);
     } catch (error) {
         console.error('Load locations error:', error);
@@ -48,6 +64,9 @@ function displayLocationList(locations) {
     locations.forEach(location => {
         const item = document.createElement('div');
         item.className = 'location-item';
+        if (selectedLocationIds.includes(location.id)) {
+            item.classList.add('selected');
+        }
         item.dataset.locationId = location.id;
         
         item.innerHTML = `
@@ -82,6 +101,58 @@ function toggleLocationSelection(locationId, element) {
         selectedLocationIds.push(locationId);
         element.classList.add('selected');
     }
+    saveSelectedLocationIds();
+}
+
+/**
+ * 選択地域を保存
+ */
+function saveSelectedLocationIds() {
+    try {
+        localStorage.setItem(SELECTED_IDS_STORAGE_KEY, JSON.stringify(selectedLocationIds));
+    } catch (error) {
+        console.error('Save selection error:', error);
+    }
+}
+
+/**
+ * 保存された選択地域を読み込み
+ * @returns {Array} 地域IDの配列
+ */
+function loadSelectedLocationIds() {
+    try {
+        const ids = JSON.parse(localStorage.getItem(SELECTED_IDS_STORAGE_KEY) || '[]');
+        return Array.isArray(ids) ? ids.filter(Number.isInteger) : [];
+    } catch (error) {
+        return [];
+    }
+}
+
+/**
+ * 予報取得APIのURL
+ * @param {Array} locationIds - 地域IDの配列
+ * @returns {string} URL
+ */
+function getForecastUrl(locationIds) {
+    return `/api/weather/forecast?location_ids=${locationIds.join(',')}`;
+}
+
+/**
+ * 前回表示した予報を復元（保存済みデータで即描画し、期限切れなら再検証）
+ */
+async function restoreLastForecasts() {
+    if (selectedLocationIds.length === 0) return;
+    
+    try {
+        const data = await cachedApiRequest(getForecastUrl(selectedLocationIds), {
+            onUpdate: (latest) => displayWeatherCards(latest.data.forecasts)
+        });
+        if (data.data.forecasts.length > 0) {
+            displayWeatherCards(data.data.forecasts);
+        }
+    } catch (error) {
+        console.error('Restore forecasts error:', error);
+    }
 }
 
 /**
@@ -106,6 +177,11 @@ async function refreshWeatherData() {
         
         if (data.status === 'success' && data.data.forecasts.length > 0) {
             displayWeatherCards(data.data.forecasts);
+            // 再訪問時に即表示できるよう保存（ETagなしのため期限後は全件取得）
+            setCachedResponse(getForecastUrl(selectedLocationIds), {
+                status: 'success',
+                data: { forecasts: data.data.forecasts }
+            });
             showNotification(data.message || '天気データを更新しました', 'success');
             
             if (data.errors && data.errors.length > 0) {
@@ -250,6 +326,7 @@ async function addLocationFromSearch(location) {
         showNotification(`${location.name}を追加しました`, 'success');
         
         // 地域リストを再読み込み
+        await deleteCachedResponse('/api/locations');
         await loadLocations();
         
         // 検索結果をクリア
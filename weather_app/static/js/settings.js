@@ -92,6 +92,8 @@ async function toggleFavorite(locationId) {
             method: 'PUT'
         });
         showNotification('お気に入りを更新しました', 'success');
+        // ホーム画面の保存済み地域一覧を破棄
+        await deleteCachedResponse('/api/locations');
         loadLocationManagementList();
     } catch (error) {
         console.error('Toggle favorite error:', error);
@@ -108,6 +110,8 @@ async function deleteLocation(locationId) {
             method: 'DELETE'
         });
         showNotification('地域を削除しました', 'success');
+        // ホーム画面の保存済み地域一覧を破棄
+        await deleteCachedResponse('/api/locations');
         loadLocationManagementList();
     } catch (error) {
         console.error('Delete location error:', error);
@@ -137,6 +141,8 @@ async function addLocation() {
         });
         
         showNotification('地域を追加しました', 'success');
+        // ホーム画面の保存済み地域一覧を破棄
+        await deleteCachedResponse('/api/locations');
         document.getElementById('location-name').value = '';
         document.getElementById('location-name-jp').value = '';
         loadLocationManagementList();
@@ -154,7 +160,8 @@ async function clearCache() {
     }
     
     try {
-        // TODO: キャッシュクリアAPIの実装
+        // ブラウザに保存した地域一覧・予報を破棄
+        await clearCachedResponses();
         showNotification('キャッシュをクリアしました', 'success');
     } catch (error) {
         console.error('Clear cache error:', error);
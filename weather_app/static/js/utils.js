@@ -22,13 +22,36 @@ function showNotification(message, type = 'info') {
     }, 5000);
 }
 
+// 実行中のリクエスト（同一リクエストを1本にまとめる）
+const inflightRequests = new Map();
+
 /**
  * API呼び出し
+ * 同じメソッド・URL・ボディのリクエストが実行中なら、その結果を共有する
+ * @param {string} url - URL
+ * @param {object} options - オプション
+ * @returns {Promise} レスポンス
+ */
+function apiRequest(url, options = {}) {
+    const key = `${options.method || 'GET'} ${url} ${options.body || ''}`;
+    if (inflightRequests.has(key)) {
+        return inflightRequests.get(key);
+    }
+    
+    const request = sendApiRequest(url, options).finally(() => {
+        inflightRequests.delete(key);
+    });
+    inflightRequests.set(key, request);
+    return request;
+}
+
+/**
+ * API呼び出し本体
  * @param {string} url - URL
  * @param {object} options - オプション
  * @returns {Promise} レスポンス
  */
-async function apiRequest(url, options = {}) {
+async function sendApiRequest(url, options = {}) {
     try {
         const response = await fetch(url, {
             ...options,
@@ -52,6 +75,156 @@ async function apiRequest(url, options = {}) {
     }
 }
 
+const RESPONSE_DB_NAME = 'weather-app';
+const RESPONSE_STORE_NAME = 'responses';
+let responseDbPromise = null;
+
+/**
+ * サーバーのキャッシュ有効期間（ミリ秒）
+ * @returns {number} 有効期間
+ */
+function getCacheDuration() {
+    const seconds = parseInt(document.body.dataset.cacheDuration, 10);
+    return (Number.isFinite(seconds) ? seconds : 1800) * 1000;
+}
+
+/**
+ * レスポンス保存用のIndexedDBを開く
+ * @returns {Promise<IDBDatabase|null>} DB（利用不可の場合はnull）
+ */
+function openResponseDb() {
+    if (!responseDbPromise) {
+        responseDbPromise = new Promise((resolve) => {
+            if (!window.indexedDB) {
+                resolve(null);
+                return;
+            }
+            const request = indexedDB.open(RESPONSE_DB_NAME, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(RESPONSE_STORE_NAME);
+            };
+            request.onsuccess = () => resolve(request.result);
+            // プライベートモード等で使えない場合はキャッシュなしで動作
+            request.onerror = () => resolve(null);
+        });
+    }
+    return responseDbPromise;
+}
+
+/**
+ * 保存済みレスポンスを操作
+ * @param {string} mode - readonly / readwrite
+ * @param {Function} operation - ストアを受け取りIDBRequestを返す関数
+ * @returns {Promise} 操作結果（DB利用不可の場合はnull）
+ */
+async function withResponseStore(mode, operation) {
+    const db = await openResponseDb();
+    if (!db) return null;
+    return new Promise((resolve) => {
+        const store = db.transaction(RESPONSE_STORE_NAME, mode).objectStore(RESPONSE_STORE_NAME);
+        const request = operation(store);
+        request.onsuccess = () => resolve(request.result ?? null);
+        request.onerror = () => resolve(null);
+    });
+}
+
+/**
+ * 保存済みレスポンスを取得
+ * @param {string} url - URL
+ * @returns {Promise<object|null>} { data, etag, storedAt }
+ */
+function getCachedResponse(url) {
+    return withResponseStore('readonly', store => store.get(url));
+}
+
+/**
+ * レスポンスを保存
+ * @param {string} url - URL
+ * @param {object} data - レスポンスデータ
+ * @param {string|null} etag - ETag
+ * @returns {Promise}
+ */
+function setCachedResponse(url, data, etag = null) {
+    return withResponseStore('readwrite', store => store.put({ data, etag, storedAt: Date.now() }, url));
+}
+
+/**
+ * 保存済みレスポンスを削除（データ更新後に呼ぶ）
+ * @param {string} url - URL
+ * @returns {Promise}
+ */
+function deleteCachedResponse(url) {
+    return withResponseStore('readwrite', store => store.delete(url));
+}
+
+/**
+ * 保存済みレスポンスをすべて削除
+ * @returns {Promise}
+ */
+function clearCachedResponses() {
+    return withResponseStore('readwrite', store => store.clear());
+}
+
+/**
+ * 保存済みレスポンスを即座に返し、期限切れならETagで再検証する
+ * @param {string} url - URL（GETのみ）
+ * @param {object} options - { ttl: 有効期間(ms), onUpdate: 再検証で内容が変わった時の処理 }
+ * @returns {Promise<object>} レスポンス
+ */
+async function cachedApiRequest(url, { ttl = getCacheDuration(), onUpdate = null } = {}) {
+    const cached = await getCachedResponse(url);
+    if (!cached) {
+        try {
+            return await fetchAndCache(url, null);
+        } catch (error) {
+            console.error(`API Error [${url}]:`, error);
+            showNotification(error.message, 'error');
+            throw error;
+        }
+    }
+    
+    if (Date.now() - cached.storedAt >= ttl) {
+        // 画面は保存済みデータで描画し、裏で再検証する
+        fetchAndCache(url, cached)
+            .then(data => {
+                if (data !== cached.data && onUpdate) onUpdate(data);
+            })
+            .catch(error => console.error(`Revalidate error [${url}]:`, error));
+    }
+    return cached.data;
+}
+
+/**
+ * 条件付きリクエストで取得して保存
+ * @param {string} url - URL
+ * @param {object|null} cached - 保存済みレスポンス
+ * @returns {Promise<object>} レスポンス（304の場合は保存済みデータ）
+ */
+function fetchAndCache(url, cached) {
+    const key = `GET ${url} revalidate`;
+    if (inflightRequests.has(key)) {
+        return inflightRequests.get(key);
+    }
+    
+    const headers = cached && cached.etag ? { 'If-None-Match': cached.etag } : {};
+    const request = fetch(url, { headers })
+        .then(async response => {
+            if (response.status === 304 && cached) {
+                await setCachedResponse(url, cached.data, cached.etag);
+                return cached.data;
+            }
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.message || `HTTP ${response.status}`);
+            }
+            await setCachedResponse(url, data, response.headers.get('ETag'));
+            return data;
+        })
+        .finally(() => inflightRequests.delete(key));
+    inflightRequests.set(key, request);
+    return request;
+}
+
 /**
  * 天気アイコンの取得
  * @param {string} iconCode - アイコンコード
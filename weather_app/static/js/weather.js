@@ -8,10 +8,11 @@
  * @returns {HTMLElement} 天気カード
  */
 function createWeatherCard(forecast) {
-    const { location, weather } = forecast;
+    const { location, weather, stale } = forecast;
     
     const card = document.createElement('div');
-    card.className = 'weather-card';
+    // 上流障害時に返される保存済みデータは古いことを明示
+    card.className = stale ? 'weather-card weather-card--stale' : 'weather-card';
     card.dataset.locationId = location.id;
     card.dataset.tempMax = weather.temp_max;
     card.dataset.tempMin = weather.temp_min;
@@ -24,6 +25,7 @@ function createWeatherCard(forecast) {
             <div>
                 <div class="weather-card__location">${location.name_jp || location.name}</div>
                 <div class="weather-card__location-sub">${location.name}</div>
+                ${stale ? `<span class="weather-card__stale-badge">前回取得: ${new Date(weather.fetched_at + 'Z').toLocaleString('ja-JP')}</span>` : ''}
             </div>
             <div class="weather-card__icon">${getWeatherIcon(weather.icon_code)}</div>
         </div>
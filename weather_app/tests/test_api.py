@@ -0,0 +1,109 @@
+"""
+views/api のテスト
+"""
+from datetime import datetime
+import pytest
+from models import db
+from models.location import Location
+from models.weather import WeatherForecast
+from services.cache_service import response_cache
+from services.spatial_index import spatial_index
+from config import Config
+from services.weather_service import CircuitOpenError
+from views import api
+from views.api import api_bp
+
+DAY = datetime(2026, 10, 20)
+
+
+@pytest.fixture
+def client(db_app):
+    db_app.register_blueprint(api_bp)
+    response_cache.init_app(db_app)
+    return db_app.test_client()
+
+
+def _add_location(name, temp_max=None, lat=35.0, lon=139.0):
+    location = Location(name=name, country_code='JP', lat=lat, lon=lon)
+    db.session.add(location)
+    db.session.commit()
+    if temp_max is not None:
+        db.session.add(WeatherForecast(
+            location_id=location.id, forecast_date=DAY, weather_main='Clear',
+            temp_max=temp_max, temp_min=temp_max - 5, fetched_at=DAY
+        ))
+        db.session.commit()
+    return location.id
+
+
+class TestRankingCursor:
+
+    @pytest.fixture(autouse=True)
+    def forecasts(self, client):
+        for i, temp_max in enumerate([10, 15, 20, 25, 30]):
+            _add_location(f"City{i}", temp_max)
+
+    def test_cursor_pages_within_range(self, client):
+        query = '/api/weather/ranking?limit=2&min=12&max=28'
+        first = client.get(query).get_json()['data']
+        assert [f['weather']['temp_max'] for f in first['forecasts']] == [25, 20]
+        second = client.get(f"{query}&cursor={first['next_cursor']}").get_json()['data']
+        assert [f['weather']['temp_max'] for f in second['forecasts']] == [15]
+        assert second['next_cursor'] is None
+
+    @pytest.mark.parametrize('changed', ['&min=0&max=28', '&min=12', '&min=12&max=40', ''])
+    def test_cursor_rejects_changed_range(self, client, changed):
+        cursor = client.get('/api/weather/ranking?limit=2&min=12&max=28').get_json()['data']['next_cursor']
+        response = client.get(f"/api/weather/ranking?limit=2{changed}&cursor={cursor}")
+        assert response.status_code == 400
+
+
+class TestBboxTruncated:
+
+    BBOX = '/api/weather/bbox?min_lat=30&min_lon=130&max_lat=40&max_lon=140'
+
+    @pytest.mark.parametrize('count, truncated', [(2, False), (3, False), (4, True)])
+    def test_truncated_only_when_more_than_limit(self, client, monkeypatch, count, truncated):
+        monkeypatch.setattr(Config, 'MAX_SPATIAL_RESULTS', 3)
+        for i in range(count):
+            _add_location(f"City{i}", 20, lat=35.0 + i * 0.1)
+        spatial_index.rebuild()
+
+        data = client.get(self.BBOX).get_json()['data']
+        assert data['truncated'] is truncated
+        assert len(data['forecasts']) == min(count, 3)
+
+
+class TestRefreshStale:
+
+    def test_upstream_failure_returns_saved_forecast_as_stale(self, client, monkeypatch):
+        saved = _add_location('Saved', 20)
+        missing = _add_location('Missing')
+
+        def fail(location_name, country_code):
+            raise CircuitOpenError('天気APIが応答していないため取得を中止しました')
+
+        monkeypatch.setattr(api.weather_service, 'get_tomorrow_forecast', fail)
+        response = client.post('/api/weather/refresh', json={'location_ids': [saved, missing]})
+
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['status'] == 'success'
+        [forecast] = body['data']['forecasts']
+        assert forecast['stale'] is True
+        assert forecast['location']['id'] == saved
+        assert forecast['weather']['temp_max'] == 20
+        assert len(body['errors']) == 2
+        assert '前回取得したデータ' in body['errors'][0]
+        assert body['message'] == '1件成功、2件失敗'
+
+    def test_all_failed_without_saved_forecast_is_error(self, client, monkeypatch):
+        missing = _add_location('Missing')
+
+        def fail(location_name, country_code):
+            raise CircuitOpenError('天気APIが応答していないため取得を中止しました')
+
+        monkeypatch.setattr(api.weather_service, 'get_tomorrow_forecast', fail)
+        body = client.post('/api/weather/refresh', json={'location_ids': [missing]}).get_json()
+        assert body['status'] == 'error'
+        assert body['data']['forecasts'] == []
@@ -0,0 +1,91 @@
+"""
+batch.run_refresh のテスト
+"""
+from datetime import datetime, timedelta
+import threading
+import time
+import pytest
+from flask import Flask
+from models import db
+from models.data_version import DataVersion  # noqa: F401  テーブル登録
+from models.location import Location
+from models.weather import WeatherForecast
+from batch import Checkpoint, run_refresh
+
+
+class FakeWeatherService:
+    """crash_at 件目の取得で例外を送出する上流APIの代わり"""
+
+    def __init__(self, crash_at=None, delay=0.0):
+        self.crash_at = crash_at
+        self.delay = delay
+        self.calls = 0
+        self.done_seen = []
+        self.checkpoint = None
+        self._lock = threading.Lock()
+
+    def get_forecast_response(self, name, country_code='JP'):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if self.checkpoint is not None:
+            self.done_seen.append(len(self.checkpoint.done))
+        if call == self.crash_at:
+            raise RuntimeError('上流の取得中に異常終了')
+        time.sleep(self.delay)
+        return {
+            'city': {'timezone': 0},
+            'list': [{
+                'dt': int((datetime.utcnow() + timedelta(days=1)).replace(hour=12).timestamp()),
+                'main': {'temp': 20, 'temp_max': 22, 'temp_min': 18, 'humidity': 50, 'pressure': 1013},
+                'weather': [{'main': 'Clear', 'description': '晴天', 'icon': '01d'}],
+                'wind': {'speed': 1.0, 'deg': 0},
+                'pop': 0.1
+            }]
+        }
+
+
+@pytest.fixture
+def targets(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'batch.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        locations = [Location(name=f"City{i}", country_code='JP') for i in range(10)]
+        db.session.add_all(locations)
+        db.session.commit()
+        yield [(location.id, location.name, 'JP') for location in locations]
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _saved_location_ids():
+    return {row.location_id for row in WeatherForecast.query.all()}
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_crash_keeps_fetched_rows_and_checkpoint(targets, tmp_path, processes):
+    service = FakeWeatherService(crash_at=6)
+    checkpoint = Checkpoint(str(tmp_path / 'state.json'), resume=False)
+
+    with pytest.raises(RuntimeError):
+        run_refresh(targets, service, checkpoint, workers=1, processes=processes, chunk_size=2)
+
+    saved = _saved_location_ids()
+    assert len(saved) == 5
+    assert Checkpoint(checkpoint.path, resume=True).done == saved
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_saves_in_chunks_while_fetching(targets, tmp_path, processes):
+    service = FakeWeatherService(delay=0.05)
+    checkpoint = Checkpoint(str(tmp_path / 'state.json'), resume=False)
+    service.checkpoint = checkpoint
+
+    stats = run_refresh(targets, service, checkpoint, workers=1, processes=processes, chunk_size=2)
+
+    assert stats['saved'] == 10
+    assert len(_saved_location_ids()) == 10
+    # 最後の取得より前にチェックポイントが進んでいる
+    assert service.done_seen[-1] > 0
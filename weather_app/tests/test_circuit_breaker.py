@@ -0,0 +1,143 @@
+"""
+services/circuit_breaker のテスト
+"""
+import pytest
+import requests
+from services import circuit_breaker
+from services.circuit_breaker import CircuitBreaker, STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN
+from services.weather_service import CircuitOpenError, WeatherService
+
+
+class FakeClock:
+    """time モジュールの代わりに進める時計"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker('test', failure_threshold=0.5, min_calls=3, window=60, open_duration=30)
+
+
+def _open(breaker):
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure()
+
+
+def test_opens_when_failure_rate_exceeds_threshold(breaker):
+    breaker.allow_request()
+    breaker.record_success()
+    breaker.allow_request()
+    breaker.record_failure()
+    # 件数が min_calls 未満の間は開かない
+    assert breaker.state == STATE_CLOSED
+    breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+    assert breaker.remaining_open_seconds() == 30
+
+
+def test_failures_outside_window_are_forgotten(breaker, clock):
+    for _ in range(2):
+        breaker.allow_request()
+        breaker.record_failure()
+    clock.now += 61
+    breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.stats()['calls'] == 1
+
+
+def test_half_open_success_closes(breaker, clock):
+    _open(breaker)
+    clock.now += 30
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.allow_request()
+    # 試行中は half_open_max_calls を超えて許可しない
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.stats()['calls'] == 0
+
+
+def test_half_open_failure_reopens(breaker, clock):
+    _open(breaker)
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert breaker.remaining_open_seconds() == 30
+    assert not breaker.allow_request()
+
+
+def test_release_returns_half_open_slot(breaker, clock):
+    _open(breaker)
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.allow_request()
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(response=response)
+
+
+class TestWeatherServiceRequest:
+
+    @pytest.fixture
+    def service(self, clock):
+        return WeatherService(api_key='test', base_url='http://upstream', breaker_options={
+            'failure_threshold': 0.5, 'min_calls': 3, 'window': 60, 'open_duration': 30
+        })
+
+    def _call(self, service, monkeypatch, error=None):
+        def get_json(url, params, cancel=None):
+            if error:
+                raise error
+            return {'ok': True}
+
+        monkeypatch.setattr(service, '_get_json', get_json)
+        return service._request('geocode', 'http://upstream/geo', {})
+
+    @pytest.mark.parametrize('status', [401, 404])
+    def test_client_errors_do_not_open(self, service, monkeypatch, status):
+        for _ in range(5):
+            with pytest.raises(requests.exceptions.HTTPError):
+                self._call(service, monkeypatch, _http_error(status))
+        assert service.breakers['geocode'].state == STATE_CLOSED
+
+    @pytest.mark.parametrize('error', [_http_error(500), _http_error(429), requests.exceptions.Timeout()])
+    def test_upstream_failures_open(self, service, monkeypatch, error):
+        for _ in range(3):
+            with pytest.raises(type(error)):
+                self._call(service, monkeypatch, error)
+        with pytest.raises(CircuitOpenError):
+            self._call(service, monkeypatch)
+
+    def test_client_error_in_half_open_releases_slot(self, service, monkeypatch, clock):
+        for _ in range(3):
+            with pytest.raises(requests.exceptions.HTTPError):
+                self._call(service, monkeypatch, _http_error(503))
+        clock.now += 30
+        with pytest.raises(requests.exceptions.HTTPError):
+            self._call(service, monkeypatch, _http_error(404))
+        # 404 は判定対象外なので枠が返り、次の試行で閉じる
+        assert service.breakers['geocode'].state == STATE_HALF_OPEN
+        assert self._call(service, monkeypatch) == {'ok': True}
+        assert service.breakers['geocode'].state == STATE_CLOSED
@@ -0,0 +1,67 @@
+"""
+views/compression のテスト
+"""
+import gzip
+import pytest
+from flask import Flask
+from services.cache_service import ResponseCache, response_cache
+from views import api, compression as compression_module
+from views.compression import compression
+
+
+@pytest.fixture
+def client(monkeypatch):
+    app = Flask(__name__)
+    response_cache.init_app(app)
+    compression.init_app(app)
+    payload = {'data': ['晴れ'] * 200}
+
+    @app.route('/cached')
+    def cached():
+        return api._cached_json_response(('cached',), [1], lambda: payload)
+
+    calls = []
+    original = compression_module._compress
+    monkeypatch.setattr(compression_module, '_compress',
+                        lambda data, encoding, level: calls.append(encoding) or original(data, encoding, level))
+    client = app.test_client()
+    client.calls = calls
+    return client
+
+
+def test_cached_response_is_compressed_once_per_encoding(client):
+    for _ in range(3):
+        response = client.get('/cached', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert b'"data"' in gzip.decompress(response.data)
+    assert client.calls == ['gzip']
+
+    response = client.get('/cached', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert client.calls == ['gzip']
+
+
+def test_compressed_variant_dropped_with_entry(client):
+    client.get('/cached', headers={'Accept-Encoding': 'gzip'})
+    response_cache.invalidate_forecasts(1)
+    assert response_cache.stats()['bytes'] == 0
+    etag = client.get('/cached', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert client.calls == ['gzip', 'gzip']
+
+    response = client.get('/cached', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_encoded_variant_counts_toward_cache_size():
+    cache = ResponseCache(max_bytes=10_000)
+    body = b'x' * 1000
+    cache.put('a', body, [1], cache.version)
+    size = cache.stats()['bytes']
+    assert cache.put_encoded('a', body, 'gzip', b'z' * 100)
+    assert cache.stats()['bytes'] == size + 100
+    assert cache.get_encoded('a', body, 'gzip') == b'z' * 100
+    # 差し替わったエントリには古い本文の圧縮版を付けない
+    cache.put('a', b'y' * 1000, [1], cache.version)
+    assert cache.get_encoded('a', body, 'gzip') is None
+    assert not cache.put_encoded('a', body, 'gzip', b'z' * 100)
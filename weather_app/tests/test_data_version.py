@@ -0,0 +1,140 @@
+"""
+services/data_version と予報ストアの差分読み込みのテスト
+"""
+from datetime import datetime, timedelta
+import threading
+import pytest
+from flask import Flask
+from models import db
+from models.data_version import DataVersion
+from models.location import Location
+from models.weather import WeatherForecast
+from services.data_version import DataVersionTracker, LOCATIONS, FORECASTS, FORECAST_DELETES, VERSION_ROWS
+from services.forecast_store import ForecastStore
+
+DAY1 = datetime(2026, 10, 20)
+DAY2 = datetime(2026, 10, 21)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'version.db'}"
+    app.config['DATA_VERSION_CHECK_INTERVAL'] = 0
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Location(name='Tokyo', country_code='JP'), Location(name='Osaka', country_code='JP')])
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def tracker(app):
+    tracker = DataVersionTracker()
+    tracker.init_app(app)
+    return tracker
+
+
+def _foreign_bump(scope):
+    """他プロセスによる更新の代わりに世代番号だけを直接進める"""
+    db.session.query(DataVersion).filter(DataVersion.id == VERSION_ROWS[scope]).update(
+        {DataVersion.version: DataVersion.version + 1}
+    )
+    db.session.commit()
+
+
+def _insert_forecast(location_id, forecast_date, temp_max, fetched_at):
+    db.session.execute(WeatherForecast.__table__.insert(), [{
+        'location_id': location_id, 'forecast_date': forecast_date,
+        'temp_max': temp_max, 'fetched_at': fetched_at
+    }])
+    db.session.commit()
+
+
+def _check(app, tracker):
+    with app.test_request_context():
+        tracker.check()
+    tracker.wait(5)
+
+
+class TestDataVersionTracker:
+
+    def test_runs_only_changed_scope_off_request_thread(self, app, tracker):
+        calls = []
+        for scope in (LOCATIONS, FORECASTS, FORECAST_DELETES):
+            tracker.on_change(scope, lambda scope=scope: calls.append((scope, threading.current_thread())))
+
+        _foreign_bump(FORECASTS)
+        _check(app, tracker)
+
+        assert [scope for scope, _ in calls] == [FORECASTS]
+        assert calls[0][1] is not threading.current_thread()
+
+    def test_own_bump_is_not_reported(self, app, tracker):
+        calls = []
+        tracker.on_change(LOCATIONS, lambda: calls.append(LOCATIONS))
+
+        tracker.bump(LOCATIONS)
+        _check(app, tracker)
+
+        assert calls == []
+
+    def test_failed_callback_is_retried(self, app, tracker):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError('一時的な失敗')
+
+        tracker.on_change(FORECASTS, flaky)
+        _foreign_bump(FORECASTS)
+        _check(app, tracker)
+        _check(app, tracker)
+        _check(app, tracker)
+
+        assert len(attempts) == 2
+
+
+class TestForecastStoreRefresh:
+
+    def test_refresh_reads_only_new_rows(self, app):
+        now = datetime.utcnow()
+        tokyo, osaka = [location.id for location in Location.query.order_by(Location.id)]
+        _insert_forecast(tokyo, DAY1, 20.0, now - timedelta(hours=3))
+        _insert_forecast(tokyo, DAY2, 21.0, now - timedelta(hours=3))
+        _insert_forecast(osaka, DAY1, 25.0, now - timedelta(hours=2))
+        store = ForecastStore()
+        store.enabled = True
+        store.load()
+
+        WeatherForecast.query.filter_by(location_id=tokyo, forecast_date=DAY1).update(
+            {'temp_max': 33.0, 'fetched_at': now}
+        )
+        db.session.commit()
+        _insert_forecast(osaka, DAY2, 26.0, now)
+
+        # 更新・追加の2件と、前回読み込んだ最新の取得日時（REFRESH_OVERLAP の範囲）の1件
+        assert store.refresh_forecasts() == 3
+        assert store.get_forecast(tokyo, DAY1).temp_max == 33.0
+        assert store.get_forecast(osaka).forecast_date == DAY2
+        assert store.stats()['forecasts'] == 4
+
+    def test_load_locations_drops_deleted_locations(self, app):
+        tokyo, osaka = [location.id for location in Location.query.order_by(Location.id)]
+        _insert_forecast(osaka, DAY1, 25.0, datetime.utcnow())
+        store = ForecastStore()
+        store.enabled = True
+        store.load()
+
+        WeatherForecast.query.filter_by(location_id=osaka).delete()
+        Location.query.filter_by(id=osaka).delete()
+        db.session.commit()
+        store.load_locations()
+
+        assert store.stats()['locations'] == 1
+        assert store.stats()['forecasts'] == 0
+        assert store.get_forecasts_by_locations([osaka]) == []
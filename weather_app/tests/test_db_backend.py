@@ -0,0 +1,181 @@
+"""
+services/db_backend のテスト
+"""
+from datetime import datetime, timedelta
+import os
+import pytest
+from sqlalchemy.engine import make_url
+from models import db
+from models.location import Location
+from models.weather import WeatherForecast
+from services.db_backend import (
+    build_engine_options, has_unique_forecast_index, latest_forecasts,
+    ranked_forecasts, resolve_database_uri, upsert_forecasts
+)
+
+DAY1 = datetime(2026, 10, 20)
+DAY2 = datetime(2026, 10, 21)
+
+
+def _add_locations(*names):
+    locations = [Location(name=name, country_code='JP') for name in names]
+    db.session.add_all(locations)
+    db.session.commit()
+    return [location.id for location in locations]
+
+
+def _row(location_id, forecast_date, temp_max, fetched_at=None):
+    return {
+        'location_id': location_id,
+        'forecast_date': forecast_date,
+        'weather_main': 'Clear',
+        'temp_max': temp_max,
+        'temp_min': temp_max - 5 if temp_max is not None else None,
+        'precipitation_probability': 10,
+        'fetched_at': fetched_at
+    }
+
+
+class TestResolveDatabaseUri:
+
+    def test_default_is_data_dir_under_app_root(self, tmp_path):
+        uri = resolve_database_uri('', str(tmp_path))
+        assert uri == f"sqlite:///{os.path.join(str(tmp_path), 'data', 'weather.db')}"
+
+    def test_relative_sqlite_path_is_resolved_from_app_root(self, tmp_path):
+        uri = resolve_database_uri('sqlite:///data/sub/weather.db', str(tmp_path))
+        assert uri == f"sqlite:///{tmp_path / 'data' / 'sub' / 'weather.db'}"
+        assert (tmp_path / 'data' / 'sub').is_dir()
+
+    def test_absolute_and_memory_sqlite_are_kept(self, tmp_path):
+        absolute = f"sqlite:///{tmp_path / 'abs.db'}"
+        assert resolve_database_uri(absolute, '/unused') == absolute
+        assert make_url(resolve_database_uri('sqlite:///:memory:', str(tmp_path))).database == ':memory:'
+
+    def test_legacy_postgres_scheme_is_normalized(self):
+        uri = resolve_database_uri('postgres://user:pass@db:5432/weather', '/unused')
+        assert uri == 'postgresql://user:pass@db:5432/weather'
+
+
+class TestBuildEngineOptions:
+
+    def test_sqlite_has_no_pool_options(self):
+        assert build_engine_options('sqlite:///x.db', {'DB_POOL_SIZE': 20}) == {}
+
+    def test_server_database_uses_pool_settings(self):
+        options = build_engine_options('postgresql://db/weather', {'DB_POOL_SIZE': 20, 'DB_POOL_PRE_PING': False})
+        assert options['pool_size'] == 20
+        assert options['pool_pre_ping'] is False
+        assert options['max_overflow'] == 10
+
+
+class TestUpsertForecasts:
+
+    def test_fast_path_matches_index(self, db_app, request):
+        # マトリクスが ON CONFLICT と汎用パスの両方を通していることの確認
+        expected = request.node.callspec.params['db_app']
+        assert has_unique_forecast_index() is expected
+
+    def test_inserts_rows(self, db_app):
+        tokyo, osaka = _add_locations('Tokyo', 'Osaka')
+        assert upsert_forecasts([_row(tokyo, DAY1, 20.0), _row(osaka, DAY1, 25.0)]) == 2
+        assert WeatherForecast.query.count() == 2
+
+    def test_overwrites_same_location_and_date(self, db_app):
+        tokyo, osaka = _add_locations('Tokyo', 'Osaka')
+        upsert_forecasts([_row(tokyo, DAY1, 20.0), _row(osaka, DAY1, 25.0)])
+        upsert_forecasts([_row(tokyo, DAY1, 33.0), _row(tokyo, DAY2, 18.0)])
+        db.session.expire_all()
+
+        assert WeatherForecast.query.count() == 3
+        rows = WeatherForecast.query.filter_by(location_id=tokyo, forecast_date=DAY1).all()
+        assert len(rows) == 1
+        assert rows[0].temp_max == 33.0
+        assert WeatherForecast.query.filter_by(location_id=osaka).one().temp_max == 25.0
+
+    def test_sets_fetched_at(self, db_app):
+        tokyo, = _add_locations('Tokyo')
+        before = datetime.utcnow() - timedelta(seconds=1)
+        upsert_forecasts([_row(tokyo, DAY1, 20.0)])
+        assert WeatherForecast.query.one().fetched_at >= before
+
+    def test_empty_rows(self, db_app):
+        assert upsert_forecasts([]) == 0
+
+
+class TestLatestForecasts:
+
+    def test_returns_most_recently_fetched_per_location(self, db_app):
+        tokyo, osaka, nagoya = _add_locations('Tokyo', 'Osaka', 'Nagoya')
+        now = datetime.utcnow()
+        upsert_forecasts([
+            _row(tokyo, DAY1, 20.0, now - timedelta(hours=2)),
+            _row(tokyo, DAY2, 21.0, now - timedelta(hours=1)),
+            _row(osaka, DAY2, 25.0, now - timedelta(hours=3)),
+            _row(osaka, DAY1, 24.0, now),
+            _row(nagoya, DAY1, 22.0, now),
+        ])
+
+        latest = latest_forecasts([tokyo, osaka])
+        assert set(latest) == {tokyo, osaka}
+        assert latest[tokyo].forecast_date == DAY2
+        assert latest[osaka].forecast_date == DAY1
+
+    def test_filters_by_date(self, db_app):
+        tokyo, osaka = _add_locations('Tokyo', 'Osaka')
+        upsert_forecasts([_row(tokyo, DAY1, 20.0), _row(tokyo, DAY2, 21.0), _row(osaka, DAY2, 25.0)])
+
+        latest = latest_forecasts([tokyo, osaka], DAY1)
+        assert set(latest) == {tokyo}
+        assert latest[tokyo].temp_max == 20.0
+
+    def test_duplicate_rows_without_unique_index(self, db_app, request):
+        if request.node.callspec.params['db_app']:
+            pytest.skip('一意インデックスがある場合は重複行を作れない')
+        tokyo, = _add_locations('Tokyo')
+        now = datetime.utcnow()
+        db.session.execute(WeatherForecast.__table__.insert(), [
+            _row(tokyo, DAY1, 20.0, now - timedelta(hours=1)),
+            _row(tokyo, DAY1, 30.0, now),
+            _row(tokyo, DAY1, 10.0, now - timedelta(hours=2)),
+        ])
+        db.session.commit()
+
+        assert latest_forecasts([tokyo])[tokyo].temp_max == 30.0
+
+    def test_empty_ids(self, db_app):
+        assert latest_forecasts([]) == {}
+
+
+class TestRankedForecasts:
+
+    def _populate(self):
+        ids = _add_locations('A', 'B', 'C', 'D', 'E')
+        temps = [25.0, 30.0, 25.0, None, 18.0]
+        upsert_forecasts(
+            [_row(location_id, DAY1, temp) for location_id, temp in zip(ids, temps)]
+            + [_row(ids[0], DAY2, 40.0)]
+        )
+        return ids
+
+    def test_orders_by_value_then_location(self, db_app):
+        a, b, c, d, e = self._populate()
+        ranked = ranked_forecasts(WeatherForecast.temp_max, DAY1, descending=True, limit=10)
+        assert [forecast.location_id for forecast in ranked] == [b, c, a, e]
+        ranked = ranked_forecasts(WeatherForecast.temp_max, DAY1, descending=False, limit=10)
+        assert [forecast.location_id for forecast in ranked] == [e, a, c, b]
+
+    def test_keyset_pages_do_not_overlap(self, db_app):
+        a, b, c, d, e = self._populate()
+        first = ranked_forecasts(WeatherForecast.temp_max, DAY1, descending=True, limit=2)
+        last = first[-1]
+        second = ranked_forecasts(
+            WeatherForecast.temp_max, DAY1, descending=True, limit=2, after=(last.temp_max, last.location_id)
+        )
+        assert [forecast.location_id for forecast in first + second] == [b, c, a, e]
+
+    def test_value_range(self, db_app):
+        a, b, c, d, e = self._populate()
+        ranked = ranked_forecasts(WeatherForecast.temp_max, DAY1, limit=10, min_value=20, max_value=25)
+        assert [forecast.location_id for forecast in ranked] == [c, a]
+        assert all(forecast.forecast_date == DAY1 for forecast in ranked)
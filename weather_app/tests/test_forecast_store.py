@@ -0,0 +1,66 @@
+"""
+services/forecast_store の列ストアのテスト
+"""
+from datetime import datetime
+from services.forecast_store import FORECAST_FIELDS, _ForecastTable
+
+DAY1 = datetime(2026, 10, 20)
+DAY2 = datetime(2026, 10, 21)
+
+
+def _values(forecast_id, location_id, forecast_date, temp_max=20.5, fetched_at=None, **overrides):
+    row = {
+        'id': forecast_id, 'location_id': location_id, 'forecast_date': forecast_date,
+        'weather_main': 'Rain', 'weather_description': '小雨', 'temp_max': temp_max, 'temp_min': 12.25,
+        'humidity': 80, 'pressure': 1008, 'wind_speed': 3.5, 'wind_deg': 270,
+        'precipitation_probability': 60, 'icon_code': '10d',
+        'fetched_at': fetched_at or datetime(2026, 10, 19, 21, 0, 0, 123456)
+    }
+    row.update(overrides)
+    return [row[field] for field in FORECAST_FIELDS]
+
+
+def test_round_trip_keeps_values_and_none():
+    table = _ForecastTable()
+    full = _values(1, 10, DAY1)
+    empty = _values(2, 10, DAY2, temp_max=None, weather_main=None, humidity=None, fetched_at=None)
+    empty[-1] = None
+    table.put(full)
+    table.put(empty)
+
+    assert [getattr(table.record(table.find(10, DAY1)), f) for f in FORECAST_FIELDS] == full
+    assert [getattr(table.record(table.find(10, DAY2)), f) for f in FORECAST_FIELDS] == empty
+
+
+def test_same_location_and_date_is_overwritten():
+    table = _ForecastTable()
+    table.put(_values(1, 10, DAY1, temp_max=20.0))
+    table.put(_values(2, 10, DAY1, temp_max=33.0))
+
+    assert len(table) == 1
+    assert table.record(table.find(10, DAY1)).temp_max == 33.0
+
+
+def test_only_newer_keeps_latest_fetch():
+    table = _ForecastTable()
+    table.put(_values(2, 10, DAY1, temp_max=33.0, fetched_at=datetime(2026, 10, 19, 22)))
+    table.put(_values(1, 10, DAY1, temp_max=20.0, fetched_at=datetime(2026, 10, 19, 21)), only_newer=True)
+
+    assert table.record(table.find(10, DAY1)).temp_max == 33.0
+
+
+def test_latest_without_date_and_slot_reuse():
+    table = _ForecastTable()
+    table.put(_values(1, 10, DAY1, fetched_at=datetime(2026, 10, 19, 22)))
+    table.put(_values(2, 10, DAY2, fetched_at=datetime(2026, 10, 19, 21)))
+    table.put(_values(3, 20, DAY1))
+    assert table.record(table.find(10)).forecast_date == DAY1
+
+    table.remove_location(10)
+    table.put(_values(4, 30, DAY1))
+    table.put(_values(5, 30, DAY2))
+
+    assert table.find(10) is None
+    assert len(table) == 3
+    assert len(table.columns['id'].data) == 3
+    assert table.record(table.find(20, DAY1)).id == 3
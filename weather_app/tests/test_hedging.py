@@ -0,0 +1,100 @@
+"""
+services/hedging のテスト
+"""
+import threading
+import pytest
+from services.hedging import HedgePolicy, percentile
+
+
+def _is_hedge():
+    return threading.current_thread().name.endswith('-1')
+
+
+def slow_primary(cancel):
+    """元の呼び出しは遅く、ヘッジはすぐ返る"""
+    if _is_hedge():
+        return 'hedge'
+    cancel.wait(0.3)
+    return 'primary'
+
+
+def fast(cancel):
+    return 'fast'
+
+
+@pytest.fixture
+def policy():
+    policy = HedgePolicy('test', enabled=True, min_delay=0.02, budget=0.1, min_samples=5, window=20)
+    for _ in range(20):
+        policy.call(fast)
+    return policy
+
+
+def test_percentile_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2, 4], 50) == 2
+    assert percentile([3, 1, 2, 4], 99) == 4
+
+
+def test_no_hedge_until_min_samples():
+    policy = HedgePolicy('test', enabled=True, min_delay=0.02, min_samples=5)
+    assert policy.hedge_delay() is None
+    assert policy.call(slow_primary) == 'primary'
+    assert policy.stats()['hedged'] == 0
+
+
+def test_disabled_never_hedges():
+    policy = HedgePolicy('test', enabled=False, min_samples=0)
+    assert policy.call(slow_primary) == 'primary'
+    stats = policy.stats()
+    assert (stats['calls'], stats['hedged'], stats['budget_denied']) == (1, 0, 0)
+
+
+def test_hedges_within_budget_of_recent_calls(policy):
+    # 直近20件の10%（2件）までヘッジする
+    assert policy.call(slow_primary) == 'hedge'
+    assert policy.call(slow_primary) == 'hedge'
+    assert policy.call(slow_primary) == 'primary'
+    stats = policy.stats()
+    assert (stats['calls'], stats['hedged'], stats['hedge_wins'], stats['budget_denied']) == (23, 2, 2, 1)
+
+    # ヘッジした呼び出しが集計窓から外れると再びヘッジできる
+    for _ in range(20):
+        policy.call(fast)
+    assert policy.call(slow_primary) == 'hedge'
+    assert policy.stats()['hedged'] == 3
+
+
+def test_in_flight_hedges_count_toward_budget(policy):
+    policy.budget = 0.05
+
+    def slow_both(cancel):
+        cancel.wait(0.1 if _is_hedge() else 0.3)
+        return 'done'
+
+    barrier = threading.Barrier(2)
+
+    def worker():
+        barrier.wait()
+        policy.call(slow_both)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = policy.stats()
+    assert (stats['hedged'], stats['budget_denied']) == (1, 1)
+    assert policy._hedges_in_flight == 0
+
+
+def test_failed_hedged_call_releases_budget(policy):
+    def failing(cancel):
+        cancel.wait(0.05)
+        raise RuntimeError('upstream')
+
+    with pytest.raises(RuntimeError):
+        policy.call(failing)
+    assert policy.stats()['hedged'] == 1
+    assert policy.stats()['hedge_wins'] == 0
+    assert policy._hedges_in_flight == 0
@@ -0,0 +1,51 @@
+"""
+services/retention_service のテスト
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from models import db
+from models.location import Location
+from models.weather import WeatherForecast
+from services.retention_service import RetentionService
+
+NOW = datetime(2026, 10, 20)
+
+
+def _add_forecasts(location_id, ages_in_days):
+    db.session.execute(WeatherForecast.__table__.insert(), [
+        {'location_id': location_id, 'forecast_date': NOW + timedelta(days=i),
+         'weather_main': 'Clear', 'fetched_at': NOW - timedelta(days=age)}
+        for i, age in enumerate(ages_in_days)
+    ])
+    db.session.commit()
+
+
+def test_purge_uses_retention_days_per_tier(db_app):
+    favorite = Location(name='Favorite', country_code='JP', is_favorite=True)
+    preset = Location(name='Tokyo', country_code='JP')
+    other = Location(name='Other', country_code='JP')
+    db.session.add_all([favorite, preset, other])
+    db.session.commit()
+    for location in (favorite, preset, other):
+        _add_forecasts(location.id, [1, 10, 20, 40])
+
+    retention = RetentionService({'favorite': 30, 'preset': 14, 'default': 7}, ['Tokyo'], chunk_size=2)
+    result = retention.purge(now=NOW)
+
+    assert result['by_tier']['favorite']['deleted'] == 1
+    assert result['by_tier']['preset']['deleted'] == 2
+    assert result['by_tier']['default']['deleted'] == 3
+    remaining = dict(db.session.query(WeatherForecast.location_id, db.func.count()).group_by(
+        WeatherForecast.location_id
+    ).all())
+    assert remaining == {favorite.id: 3, preset.id: 2, other.id: 1}
+
+
+def test_expired_ids_query_is_index_range_scan_without_sort(db_app):
+    if db.engine.dialect.name != 'sqlite':
+        return
+    query = RetentionService({}, [], chunk_size=500)._expired_ids_query([1, 2, 3], NOW)
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    plan = ' '.join(row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {statement}")))
+    assert 'idx_location_fetched_at' in plan
+    assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,123 @@
+"""
+services/shared_cache の単一フライトのテスト
+"""
+import multiprocessing
+import os
+import threading
+import time
+import pytest
+from services.shared_cache import FileCacheBackend, MemoryCacheBackend
+
+
+@pytest.fixture(params=['memory', 'file'])
+def make_backend(request, tmp_path):
+    """ノードごとのバックエンドを作る関数（メモリは1プロセス内で共有）"""
+    if request.param == 'memory':
+        shared = MemoryCacheBackend()
+        return lambda: shared
+    return lambda: FileCacheBackend(str(tmp_path))
+
+
+def _run_concurrently(make_backend, count: int, fetch):
+    barrier = threading.Barrier(count)
+    results = []
+
+    def worker():
+        backend = make_backend()
+        barrier.wait()
+        results.append(backend.get_or_fetch('forecast:Tokyo', 60, fetch, lock_timeout=5))
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_get_or_fetch_fetches_once(make_backend):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'temp': 20}
+
+    results = _run_concurrently(make_backend, 16, fetch)
+    assert len(calls) == 1
+    assert results == [{'temp': 20}] * 16
+
+
+def test_get_or_fetch_releases_lock_after_failed_fetch(make_backend):
+    backend = make_backend()
+
+    def fail():
+        raise RuntimeError('upstream')
+
+    with pytest.raises(RuntimeError):
+        backend.get_or_fetch('forecast:Tokyo', 60, fail, lock_timeout=5)
+    # 失敗してもロックは解放され、次の呼び出しは待たずに取得する
+    started = time.monotonic()
+    assert backend.get_or_fetch('forecast:Tokyo', 60, lambda: 1, lock_timeout=5) == 1
+    assert time.monotonic() - started < 1
+
+
+def test_file_lock_left_by_crashed_node_is_taken_over_once(tmp_path):
+    backend = FileCacheBackend(str(tmp_path))
+    # 落ちたノードが残したロックファイル（誰もロックしていない）
+    with open(backend._path('lock:forecast:Tokyo', '.lock'), 'w') as f:
+        f.write('{"token": "dead", "expires_at": 0}')
+
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'fresh'
+
+    results = _run_concurrently(lambda: FileCacheBackend(str(tmp_path)), 16, fetch)
+    assert len(calls) == 1
+    assert results == ['fresh'] * 16
+
+
+def test_file_lock_is_exclusive_while_held(tmp_path):
+    holder = FileCacheBackend(str(tmp_path))
+    other = FileCacheBackend(str(tmp_path))
+    token = holder.acquire_lock('lock:k', 0.01)
+    assert token
+    time.sleep(0.05)
+    # ttl を過ぎても保持中のロックは奪えず、掃除でも削除されない
+    assert other.acquire_lock('lock:k', 1) is None
+    assert other.sweep() == 0
+    holder.release_lock('lock:k', token)
+    assert other.acquire_lock('lock:k', 1)
+
+
+def test_sweep_removes_unheld_lock_file(tmp_path):
+    backend = FileCacheBackend(str(tmp_path))
+    path = backend._path('lock:k', '.lock')
+    open(path, 'w').close()
+    assert backend.sweep() == 1
+    assert not os.path.exists(path)
+
+
+def _hold_lock_and_exit(directory: str, ready):
+    backend = FileCacheBackend(directory)
+    assert backend.acquire_lock('lock:k', 60)
+    ready.set()
+    time.sleep(0.2)
+    # 解放せずに終了
+    os._exit(0)
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='fork を使う')
+def test_file_lock_released_when_holder_process_dies(tmp_path):
+    context = multiprocessing.get_context('fork')
+    ready = context.Event()
+    process = context.Process(target=_hold_lock_and_exit, args=(str(tmp_path), ready))
+    process.start()
+    assert ready.wait(5)
+    backend = FileCacheBackend(str(tmp_path))
+    assert backend.acquire_lock('lock:k', 60) is None
+    process.join(5)
+    assert backend.acquire_lock('lock:k', 60)
@@ -0,0 +1,31 @@
+"""
+services/spatial_index のテスト
+"""
+import pytest
+from services.spatial_index import SpatialIndex
+
+
+@pytest.fixture(params=[1.0, 0.5, 5.0])
+def index(request):
+    index = SpatialIndex(request.param)
+    index.add(1, 10.0, 180.0)
+    index.add(2, 10.0, 170.0)
+    index.add(3, 10.0, -179.5)
+    return index
+
+
+def test_nearest_finds_point_on_antimeridian(index):
+    assert index.nearest(10.0, 179.9, 1)[0][0] == 1
+    assert [location_id for location_id, _ in index.nearest(10.0, -179.9, 3)] == [1, 3, 2]
+
+
+def test_bbox_includes_point_on_antimeridian(index):
+    assert index.within_bbox(0, 175, 20, 180) == [1]
+    assert sorted(index.within_bbox(0, 175, 20, -175)) == [1, 3]
+    assert sorted(index.within_bbox(-90, -180, 90, 180)) == [1, 2, 3]
+
+
+def test_remove_point_on_antimeridian(index):
+    index.remove(1)
+    assert len(index) == 2
+    assert index.nearest(10.0, 179.9, 1)[0][0] == 3
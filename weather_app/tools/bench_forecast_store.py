@@ -0,0 +1,123 @@
+"""
+インメモリ予報ストアの計測
+
+一時SQLiteに地域・予報を作成し、1行あたりのメモリ（ストアの列ストア、
+行ごとの __slots__ レコード、ORMインスタンス）と get_weather_forecasts_by_locations
+の読み込みレイテンシ（ストアとDB）を比較する。
+
+使い方（weather_app ディレクトリで実行）:
+    python tools/bench_forecast_store.py --locations 1000 --days 7
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db
+from models.location import Location
+from models.weather import WeatherForecast
+from services.data_service import DataService
+from services.forecast_store import forecast_store, ForecastRecord, FORECAST_FIELDS, _ForecastTable
+
+
+def _populate(location_count: int, days: int):
+    """計測用の地域・予報を作成"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    db.session.execute(Location.__table__.insert(), [
+        {'name': f"City{i}", 'lat': 20 + i % 25, 'lon': 120 + i % 30,
+         'country_code': 'JP', 'is_favorite': False, 'created_at': today}
+        for i in range(location_count)
+    ])
+    db.session.execute(WeatherForecast.__table__.insert(), [
+        {'location_id': location_id, 'forecast_date': today + timedelta(days=day),
+         'weather_main': 'Clear', 'weather_description': '晴天',
+         'temp_max': 20.0 + day, 'temp_min': 10.0 + day, 'humidity': 50, 'pressure': 1013,
+         'wind_speed': 3.5, 'wind_deg': 180, 'precipitation_probability': 10,
+         'icon_code': '01d', 'fetched_at': today + timedelta(minutes=day)}
+        for location_id in range(1, location_count + 1) for day in range(days)
+    ])
+    db.session.commit()
+
+
+def _bytes_per_row(build, rows: int) -> float:
+    """build() が返すオブジェクトを保持するのに増えたメモリ（1行あたりのバイト数）"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / rows
+
+
+def _build_table(query) -> _ForecastTable:
+    table = _ForecastTable()
+    for row in query:
+        table.put(row)
+    return table
+
+
+def _latency_us(func, repeat: int) -> dict:
+    """func の実行時間（マイクロ秒）の p50 / p99"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    samples.sort()
+    return {'p50': statistics.median(samples), 'p99': samples[int(len(samples) * 0.99) - 1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='インメモリ予報ストアの計測')
+    parser.add_argument('--locations', type=int, default=1000, help='地域数')
+    parser.add_argument('--days', type=int, default=7, help='地域あたりの予報日数')
+    parser.add_argument('--batch', type=int, default=20, help='1回の読み込みで取得する地域数')
+    parser.add_argument('--repeat', type=int, default=2000, help='レイテンシの計測回数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            _populate(args.locations, args.days)
+            rows = args.locations * args.days
+
+            columns = [getattr(WeatherForecast, f) for f in FORECAST_FIELDS]
+            store_bytes = _bytes_per_row(lambda: _build_table(db.session.query(*columns)), rows)
+            record_bytes = _bytes_per_row(
+                lambda: [ForecastRecord(*row) for row in db.session.query(*columns)], rows
+            )
+            orm_bytes = _bytes_per_row(lambda: WeatherForecast.query.all(), rows)
+            db.session.expunge_all()
+
+            started = time.perf_counter()
+            forecast_store.enabled = True
+            forecast_store.load()
+            load_ms = (time.perf_counter() - started) * 1000
+
+            ids = list(range(1, args.batch + 1))
+            store = _latency_us(lambda: DataService.get_weather_forecasts_by_locations(ids), args.repeat)
+            forecast_store.enabled = False
+            database = _latency_us(lambda: DataService.get_weather_forecasts_by_locations(ids), args.repeat // 10)
+
+    print(f"予報 {rows}行（{args.locations}地域 x {args.days}日）")
+    print(f"1行あたりのメモリ: 列ストア {store_bytes:.0f}B / __slots__ レコード {record_bytes:.0f}B / "
+          f"ORM {orm_bytes:.0f}B")
+    print(f"ストアの読み込み: {load_ms:.0f}ms")
+    print(f"{args.batch}地域の取得: ストア p50 {store['p50']:.0f}us p99 {store['p99']:.0f}us / "
+          f"DB p50 {database['p50']:.0f}us p99 {database['p99']:.0f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+ヘッジリクエストの計測
+
+遅延を注入したローカルの上流スタブを起動し、HEDGE_ENABLED の無効・有効で
+予報取得を順次実行して呼び出し側から見たレイテンシ（p50 / p99）を比較する。
+スタブは --slow-rate の割合で --slow-seconds 秒、それ以外は10-30msで応答する。
+
+使い方（weather_app ディレクトリで実行）:
+    python tools/bench_hedging.py --requests 1000 --slow-rate 0.02
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.hedging import percentile
+from services.weather_service import WeatherService
+
+
+def start_stub(slow_rate: float, slow_seconds: float, seed: int) -> ThreadingHTTPServer:
+    """遅延を注入した予報APIのスタブを空きポートで起動"""
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with rng_lock:
+                slow = rng.random() < slow_rate
+                delay = slow_seconds if slow else rng.uniform(0.01, 0.03)
+            time.sleep(delay)
+            body = json.dumps({
+                'city': {'timezone': 32400},
+                'list': [{
+                    'dt': int(time.time()) + 86400,
+                    'main': {'temp': 20, 'temp_max': 22, 'temp_min': 18, 'humidity': 50, 'pressure': 1013},
+                    'weather': [{'main': 'Clear', 'description': '晴天', 'icon': '01d'}],
+                    'wind': {'speed': 1.0, 'deg': 0},
+                    'pop': 0.1
+                }]
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except OSError:
+                # ヘッジで負けた側は本文を読まずに切断される
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(base_url: str, enabled: bool, count: int) -> dict:
+    """予報取得を count 件順次実行し、レイテンシ（ms）とヘッジ統計を返す"""
+    service = WeatherService(
+        api_key='bench', base_url=base_url, timeout=10,
+        hedge_options={**Config.HEDGE_OPTIONS, 'enabled': enabled}
+    )
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        service.get_forecast_response(f"City{i}")
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'hedge': service.hedge.stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ヘッジリクエストの計測')
+    parser.add_argument('--requests', type=int, default=1000, help='取得件数')
+    parser.add_argument('--slow-rate', type=float, default=0.02, help='遅い応答の割合')
+    parser.add_argument('--slow-seconds', type=float, default=1.0, help='遅い応答の秒数')
+    parser.add_argument('--seed', type=int, default=1, help='遅延注入の乱数シード')
+    args = parser.parse_args()
+    logging.getLogger('services').setLevel(logging.WARNING)
+
+    for enabled in (False, True):
+        server = start_stub(args.slow_rate, args.slow_seconds, args.seed)
+        try:
+            result = run(f"http://127.0.0.1:{server.server_port}", enabled, args.requests)
+        finally:
+            server.shutdown()
+            server.server_close()
+        hedge = result['hedge']
+        print(
+            f"ヘッジ{'有効' if enabled else '無効'}: p50 {result['p50']:.1f}ms / p99 {result['p99']:.1f}ms"
+            + (f"（ヘッジ{hedge['hedged']}件, 採用{hedge['hedge_wins']}件, 予算超過{hedge['budget_denied']}件）"
+               if enabled else '')
+        )
+
+
+if __name__ == '__main__':
+    main()
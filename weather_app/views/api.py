@@ -1,14 +1,22 @@
 """
 API エンドポイント
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response
 from datetime import datetime, timedelta
 from services.weather_service import WeatherService, WeatherAPIError
-from services.data_service import DataService
+from services.data_service import DataService, RANKING_METRICS
+from services.cache_service import response_cache, ALL_LOCATIONS
+from services.spatial_index import spatial_index
+from services.board_service import board_snapshots
+from services.export_service import write_csv
+from views.profiling import admin_required
+from views.compression import compression
 from models.location import Location
 from config import Config
 import logging
-import csv
+import base64
+import hashlib
+import json
 import io
 
 logger = logging.getLogger(__name__)
@@ -16,21 +24,57 @@ logger = logging.getLogger(__name__)
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 # WeatherServiceのインスタンス化
-weather_service = WeatherService(
-    api_key=Config.OPENWEATHER_API_KEY,
-    base_url=Config.OPENWEATHER_BASE_URL,
-    timeout=Config.API_TIMEOUT
-)
+weather_service = WeatherService.from_config(Config)
+
+def _cached_json_response(key, location_ids, build_payload):
+    """
+    シリアライズ済みキャッシュを使ってJSONレスポンスを返す
+
+    Args:
+        key: キャッシュキー
+        location_ids: レスポンスが依存する地域ID
+        build_payload: キャッシュミス時にレスポンス辞書を生成する関数
+
+    Returns:
+        Flaskレスポンス
+    """
+    body = response_cache.get(key)
+    if body is None:
+        version = response_cache.version
+        body = current_app.json.dumps(build_payload()).encode('utf-8')
+        response_cache.put(key, body, location_ids, version)
+    # クライアントがIf-None-Matchで再検証できるよう内容ハッシュをETagにする
+    etag = hashlib.sha1(body).hexdigest()
+    encoding = compression.choose_encoding(len(body))
+    if encoding:
+        # 圧縮済みの本文もキャッシュし、ヒットのたびに圧縮し直さない
+        data = response_cache.get_encoded(key, body, encoding)
+        if data is None:
+            data = compression.compress(body, encoding)
+            response_cache.put_encoded(key, body, encoding, data)
+        response = Response(data, status=200, mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+        # バイト列が変わるため弱いETagにする（compress_response と同じ）
+        response.set_etag(etag, weak=True)
+    else:
+        response = Response(body, status=200, mimetype='application/json')
+        response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 @api_bp.route('/locations', methods=['GET'])
 def get_locations():
     """全ての地域を取得"""
     try:
-        locations = DataService.get_all_locations()
-        return jsonify({
-            'status': 'success',
-            'data': [loc.to_dict() for loc in locations]
-        }), 200
+        return _cached_json_response(
+            ('locations',),
+            [ALL_LOCATIONS],
+            lambda: {
+                'status': 'success',
+                'data': [loc.to_dict() for loc in DataService.get_all_locations()]
+            }
+        )
     except Exception as e:
         logger.error(f"地域取得エラー: {e}")
         return jsonify({
@@ -56,6 +100,8 @@ def add_location():
             }), 400
         
         location = DataService.add_location(name, name_jp, lat, lon, country_code)
+        # プリセット名の地域は天気ボードの対象になる
+        _rebuild_board()
         return jsonify({
             'status': 'success',
             'data': location.to_dict(),
@@ -74,6 +120,7 @@ def delete_location(location_id):
     try:
         success = DataService.delete_location(location_id)
         if success:
+            _rebuild_board()
             return jsonify({
                 'status': 'success',
                 'message': '地域を削除しました'
@@ -96,6 +143,8 @@ def toggle_favorite(location_id):
     try:
         location = DataService.toggle_favorite(location_id)
         if location:
+            # お気に入りは天気ボードの対象のため作り直す
+            _rebuild_board()
             return jsonify({
                 'status': 'success',
                 'data': location.to_dict(),
@@ -168,24 +217,199 @@ def get_weather_forecast():
         if date_str:
             forecast_date = datetime.fromisoformat(date_str)
         
-        forecasts = DataService.get_weather_forecasts_by_locations(location_ids, forecast_date)
+        cache_key = (
+            'forecast',
+            tuple(location_ids),
+            forecast_date.isoformat() if forecast_date else None
+        )
+        return _cached_json_response(
+            cache_key,
+            location_ids,
+            lambda: {
+                'status': 'success',
+                'data': {
+                    'forecasts': DataService.get_weather_forecasts_by_locations(location_ids, forecast_date)
+                }
+            }
+        )
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': '無効な地域IDまたは日付形式です'
+        }), 400
+    except Exception as e:
+        logger.error(f"天気予報取得エラー: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+def _parse_date_arg():
+    """クエリのdateを日付に変換（未指定はNone）"""
+    date_str = request.args.get('date')
+    return datetime.fromisoformat(date_str) if date_str else None
+
+@api_bp.route('/weather/nearest', methods=['GET'])
+def get_nearest_forecasts():
+    """指定座標に近い地域の天気予報を取得"""
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        limit = min(int(request.args.get('limit', 5)), Config.MAX_SPATIAL_RESULTS)
+        radius = request.args.get('radius_km')
+        radius = float(radius) if radius else None
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180) or limit < 1:
+            raise ValueError('out of range')
+        forecast_date = _parse_date_arg()
+        
+        nearest = spatial_index.nearest(lat, lon, limit, radius)
+        distances = dict(nearest)
+        forecasts = DataService.get_weather_forecasts_by_locations(
+            [location_id for location_id, _ in nearest], forecast_date
+        )
+        for item in forecasts:
+            item['distance_km'] = distances[item['location']['id']]
         
         return jsonify({
             'status': 'success',
             'data': {'forecasts': forecasts}
         }), 200
-    except ValueError as e:
+    except (KeyError, ValueError):
         return jsonify({
             'status': 'error',
-            'message': '無効な地域IDまたは日付形式です'
+            'message': '緯度・経度・件数または日付の指定が無効です'
         }), 400
     except Exception as e:
-        logger.error(f"天気予報取得エラー: {e}")
+        logger.error(f"近傍予報取得エラー: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@api_bp.route('/weather/bbox', methods=['GET'])
+def get_bbox_forecasts():
+    """矩形範囲内の地域の天気予報を取得"""
+    try:
+        min_lat = float(request.args['min_lat'])
+        min_lon = float(request.args['min_lon'])
+        max_lat = float(request.args['max_lat'])
+        max_lon = float(request.args['max_lon'])
+        if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+            raise ValueError('out of range')
+        forecast_date = _parse_date_arg()
+        
+        # 上限ちょうどの場合と区別するため1件多く取得
+        location_ids = spatial_index.within_bbox(
+            min_lat, min_lon, max_lat, max_lon, limit=Config.MAX_SPATIAL_RESULTS + 1
+        )
+        truncated = len(location_ids) > Config.MAX_SPATIAL_RESULTS
+        location_ids = location_ids[:Config.MAX_SPATIAL_RESULTS]
+        forecasts = DataService.get_weather_forecasts_by_locations(location_ids, forecast_date)
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'forecasts': forecasts,
+                'truncated': truncated
+            }
+        }), 200
+    except (KeyError, ValueError):
+        return jsonify({
+            'status': 'error',
+            'message': '範囲または日付の指定が無効です'
+        }), 400
+    except Exception as e:
+        logger.error(f"範囲予報取得エラー: {e}")
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
 
+def _encode_cursor(date, metric, order, min_value, max_value, after):
+    """ランキングの次ページ位置を、対象の予報日・項目・並び順・値の範囲とともにクエリ用の文字列に変換"""
+    payload = [date.isoformat(), metric, order, min_value, max_value, *after]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor):
+    """_encode_cursor の逆変換（予報日, 項目, 並び順, 下限, 上限, (値, location_id)）"""
+    date, metric, order, min_value, max_value, value, location_id = json.loads(
+        base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    )
+    return (
+        datetime.fromisoformat(date), metric, order,
+        None if min_value is None else float(min_value),
+        None if max_value is None else float(max_value),
+        (float(value), int(location_id))
+    )
+
+@api_bp.route('/weather/ranking', methods=['GET'])
+def get_forecast_ranking():
+    """
+    予報日の天気予報をランキングで取得
+    
+    metric: temp_max / precipitation_probability
+    order: desc（既定）/ asc
+    limit: 件数（最大MAX_RANKING_RESULTS）
+    min / max: 値の範囲（以上・以下）
+    cursor: 前ページの next_cursor
+    """
+    try:
+        metric = request.args.get('metric', 'temp_max')
+        order = request.args.get('order', 'desc')
+        limit = int(request.args.get('limit', 10))
+        if metric not in RANKING_METRICS or order not in ('asc', 'desc') or limit < 1:
+            raise ValueError('invalid ranking')
+        limit = min(limit, Config.MAX_RANKING_RESULTS)
+        min_value = request.args.get('min', type=float)
+        max_value = request.args.get('max', type=float)
+        cursor = request.args.get('cursor')
+        forecast_date = _parse_date_arg()
+        after = None
+        if cursor:
+            cursor_date, cursor_metric, cursor_order, cursor_min, cursor_max, after = _decode_cursor(cursor)
+            # 日付省略時も1ページ目で決まった予報日を引き継ぎ、条件が変わったカーソルは受け付けない
+            if (cursor_metric, cursor_order, cursor_min, cursor_max) != (metric, order, min_value, max_value) \
+                    or forecast_date not in (None, cursor_date):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'カーソルの項目・並び順・値の範囲・日付が指定と一致しません'
+                }), 400
+            forecast_date = cursor_date
+        
+        result = DataService.get_forecast_ranking(
+            metric, forecast_date, order == 'desc', limit, after, min_value, max_value
+        )
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'date': result['date'].isoformat() if result['date'] else None,
+                'forecasts': result['forecasts'],
+                'next_cursor': (
+                    _encode_cursor(result['date'], metric, order, min_value, max_value, result['next'])
+                    if result['next'] else None
+                )
+            }
+        }), 200
+    except (TypeError, ValueError):
+        return jsonify({
+            'status': 'error',
+            'message': '項目・並び順・件数・カーソルまたは日付の指定が無効です'
+        }), 400
+    except Exception as e:
+        logger.error(f"ランキング取得エラー: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+def _rebuild_board():
+    """天気ボードを作り直す（失敗してもリクエスト自体は成功させる）"""
+    try:
+        return board_snapshots.build()
+    except Exception as e:
+        logger.error(f"天気ボード作成エラー: {e}")
+        return None
+
 @api_bp.route('/weather/refresh', methods=['POST'])
 def refresh_weather():
     """天気データを更新"""
@@ -223,11 +447,24 @@ def refresh_weather():
                     'weather': forecast.to_dict()
                 })
             except WeatherAPIError as e:
-                errors.append(f"{location.name}: {str(e)}")
+                # 上流障害時は保存済みの最新予報を古いデータとして返す
+                stale = DataService.get_weather_forecasts_by_locations([location_id])
+                if stale:
+                    results.append({**stale[0], 'stale': True})
+                    errors.append(f"{location.name}: {str(e)}（前回取得したデータを表示します）")
+                else:
+                    errors.append(f"{location.name}: {str(e)}")
             except Exception as e:
                 logger.error(f"天気データ更新エラー (location_id={location_id}): {e}")
                 errors.append(f"地域ID {location_id}: {str(e)}")
         
+        # ボード対象の地域が更新された場合は事前生成ファイルを作り直す
+        if any(
+            item['location']['name'] in board_snapshots.preset_names or item['location']['is_favorite']
+            for item in results if not item.get('stale')
+        ):
+            _rebuild_board()
+        
         response = {
             'status': 'success' if results else 'error',
             'data': {'forecasts': results}
@@ -273,27 +510,7 @@ def export_weather():
         if format_type == 'csv':
             # CSV形式でエクスポート
             output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # ヘッダー
-            writer.writerow([
-                '地域名', '日本語名', '日付', '天気', '天気詳細',
-                '最高気温(℃)', '最低気温(℃)', '湿度(%)', '気圧(hPa)',
-                '風速(m/s)', '風向(度)', '降水確率(%)'
-            ])
-            
-            # データ
-            for item in forecasts:
-                loc = item['location']
-                weather = item['weather']
-                writer.writerow([
-                    loc['name'], loc['name_jp'], weather['forecast_date'],
-                    weather['weather_main'], weather['weather_description'],
-                    weather['temp_max'], weather['temp_min'],
-                    weather['humidity'], weather['pressure'],
-                    weather['wind_speed'], weather['wind_deg'],
-                    weather['precipitation_probability']
-                ])
+            write_csv(forecasts, output)
             
             output.seek(0)
             filename = f"weather_forecast_{datetime.now().strftime('%Y%m%d')}.csv"
@@ -323,3 +540,61 @@ def export_weather():
             'status': 'error',
             'message': str(e)
         }), 500
+
+@api_bp.route('/maintenance/cleanup', methods=['POST'])
+@admin_required
+def cleanup_forecasts():
+    """保持期間を過ぎた天気予報を削除"""
+    try:
+        data = request.get_json(silent=True) or {}
+        days = data.get('days')
+        if days is not None:
+            days = int(days)
+            if days < 0:
+                raise ValueError(days)
+        
+        result = DataService.cleanup_old_forecasts(days)
+        return jsonify({
+            'status': 'success',
+            'data': result,
+            'message': f"{result['deleted']}件の天気予報を削除しました"
+        }), 200
+    except (TypeError, ValueError):
+        return jsonify({
+            'status': 'error',
+            'message': '保持日数は0以上の整数で指定してください'
+        }), 400
+    except Exception as e:
+        logger.error(f"天気予報削除エラー: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@api_bp.route('/maintenance/board', methods=['POST'])
+@admin_required
+def rebuild_board():
+    """天気ボードを作り直す"""
+    manifest = _rebuild_board()
+    if manifest is None:
+        return jsonify({
+            'status': 'error',
+            'message': '天気ボードの作成に失敗しました'
+        }), 500
+    return jsonify({
+        'status': 'success',
+        'data': manifest,
+        'message': f"天気ボードを作成しました（{manifest['count']}件）"
+    }), 200
+
+@api_bp.route('/maintenance/upstream', methods=['GET'])
+@admin_required
+def get_upstream_stats():
+    """上流APIのサーキット状態とヘッジの統計"""
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'breakers': {name: breaker.stats() for name, breaker in weather_service.breakers.items()},
+            'hedge': weather_service.hedge.stats()
+        }
+    }), 200
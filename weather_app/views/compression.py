@@ -0,0 +1,226 @@
+"""
+レスポンス圧縮と静的ファイル配信
+"""
+from flask import Response, request, send_from_directory
+from typing import Dict, Optional
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+import logging
+
+try:
+    import brotli
+except ImportError:  # brotliは任意依存。無ければgzipのみ
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 圧縮対象のMIMEタイプ
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'text/javascript',
+    'text/css', 'text/html', 'text/csv', 'text/plain', 'image/svg+xml'
+}
+
+# 指紋付きURLの静的ファイルに付けるキャッシュ指定（1年・不変）
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def _supported_encodings():
+    """サーバー側の優先順で利用可能な圧縮形式"""
+    return ['br', 'gzip'] if brotli else ['gzip']
+
+
+def _negotiate_encoding() -> Optional[str]:
+    """Accept-Encodingから使用する圧縮形式を選択"""
+    return request.accept_encodings.best_match(_supported_encodings())
+
+
+def _compress(data: bytes, encoding: str, level: int) -> bytes:
+    """指定形式で圧縮"""
+    if encoding == 'br':
+        # brotliの品質は0-11。gzipレベル(1-9)に近い速度帯へ合わせる
+        return brotli.compress(data, quality=min(11, level))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class Compression:
+    """
+    動的レスポンスの圧縮
+
+    after_request で圧縮対象のMIMEタイプかつ閾値以上のレスポンスを、
+    クライアントが受け入れる形式（br優先、次にgzip）で圧縮する。
+    レスポンスキャッシュの本文は choose_encoding / compress で圧縮済みの
+    ものをキャッシュし、Content-Encoding 付きで返すため after_request では圧縮しない。
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.min_size = 500
+        self.level = 5
+
+    def init_app(self, app):
+        """設定を反映し after_request を登録"""
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', self.min_size)
+        self.level = app.config.get('COMPRESSION_LEVEL', self.level)
+        self.enabled = app.config.get('COMPRESSION_ENABLED', True)
+        if self.enabled:
+            app.after_request(self.compress_response)
+
+    def choose_encoding(self, size: int) -> Optional[str]:
+        """size バイトの本文に使う圧縮形式（圧縮しない場合はNone）"""
+        if not self.enabled or size < self.min_size:
+            return None
+        return _negotiate_encoding()
+
+    def compress(self, data: bytes, encoding: str) -> bytes:
+        """設定の圧縮レベルで圧縮"""
+        return _compress(data, encoding, self.level)
+
+    def compress_response(self, response: Response) -> Response:
+        """条件を満たすレスポンスを圧縮"""
+        if (response.status_code < 200 or response.status_code >= 300
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        encoding = _negotiate_encoding()
+        if not encoding:
+            return response
+
+        response.set_data(self.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        # バイト列が変わるため弱いETagにする（If-None-Matchの弱い比較で一致する）
+        etag, _ = response.get_etag()
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+class _Asset:
+    """静的ファイル1件分の指紋と圧縮済みデータ"""
+
+    __slots__ = ('path', 'mtime', 'digest', 'mimetype', 'variants')
+
+    def __init__(self, path: str, mtime: float, digest: str, mimetype: str, variants: Dict[str, bytes]):
+        self.path = path
+        self.mtime = mtime
+        self.digest = digest
+        self.mimetype = mimetype
+        self.variants = variants
+
+
+class StaticAssets:
+    """
+    指紋付きURLと事前圧縮による静的ファイル配信
+
+    起動時に static 配下の内容ハッシュと圧縮版を作成し、
+    url_for('static', ...) に ?v=<ハッシュ> を自動付与する。
+    ハッシュ一致のリクエストは1年間の不変キャッシュで返す。
+    ファイルが更新された場合は次回参照時に作り直す（開発時の編集向け）。
+    """
+
+    def __init__(self):
+        self.static_folder = None
+        self.min_size = 500
+        self._assets: Dict[str, _Asset] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """静的ファイルを読み込み、URL生成と配信関数を差し替える"""
+        self.static_folder = app.static_folder
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', self.min_size)
+
+        count = 0
+        for root, _, files in os.walk(self.static_folder):
+            for name in files:
+                filename = os.path.relpath(os.path.join(root, name), self.static_folder)
+                if self._load(filename.replace(os.sep, '/')):
+                    count += 1
+        logger.info(f"静的ファイルを読み込みました: {count}件")
+
+        app.url_defaults(self._add_fingerprint)
+        app.view_functions['static'] = self.serve
+
+    def fingerprint(self, filename: str) -> Optional[str]:
+        """ファイルの内容ハッシュを取得"""
+        asset = self._get(filename)
+        return asset.digest if asset else None
+
+    def serve(self, filename: str) -> Response:
+        """静的ファイルを配信（staticエンドポイントの差し替え先）"""
+        asset = self._get(filename)
+        if asset is None:
+            return send_from_directory(self.static_folder, filename)
+
+        encoding = None
+        if len(asset.variants) > 1:
+            encoding = request.accept_encodings.best_match(
+                [enc for enc in _supported_encodings() if enc in asset.variants]
+            )
+        response = Response(asset.variants[encoding or 'identity'], mimetype=asset.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(f"{asset.digest}-{encoding or 'identity'}")
+
+        if request.args.get('v') == asset.digest:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            # 指紋なし・古い指紋のURLは毎回検証させる
+            response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    def _add_fingerprint(self, endpoint: str, values: Dict):
+        """url_for('static') に内容ハッシュを付与"""
+        if endpoint != 'static' or 'v' in values:
+            return
+        digest = self.fingerprint(values.get('filename', ''))
+        if digest:
+            values['v'] = digest
+
+    def _get(self, filename: str) -> Optional[_Asset]:
+        """最新の内容に対応するアセットを取得"""
+        asset = self._assets.get(filename)
+        if asset is None:
+            return None
+        try:
+            if os.path.getmtime(asset.path) != asset.mtime:
+                return self._load(filename)
+        except OSError:
+            return None
+        return asset
+
+    def _load(self, filename: str) -> Optional[_Asset]:
+        """ファイルを読み込み、指紋と圧縮版を作成"""
+        path = os.path.join(self.static_folder, *filename.split('/'))
+        try:
+            mtime = os.path.getmtime(path)
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        variants = {'identity': data}
+        if mimetype in COMPRESSIBLE_MIMETYPES and len(data) >= self.min_size:
+            # 静的ファイルは一度きりなので最高圧縮率で作る
+            variants['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+            if brotli:
+                variants['br'] = brotli.compress(data, quality=11)
+
+        asset = _Asset(path, mtime, hashlib.sha256(data).hexdigest()[:12], mimetype, variants)
+        with self._lock:
+            self._assets[filename] = asset
+        return asset
+
+
+compression = Compression()
+static_assets = StaticAssets()
@@ -1,7 +1,10 @@
 """
 メインページビュー
 """
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, send_file, abort
+from services.board_service import board_snapshots, BOARD_FORMATS
+from views.compression import IMMUTABLE_CACHE_CONTROL
+import os
 
 main_bp = Blueprint('main', __name__)
 
@@ -14,3 +17,48 @@ def index():
 def settings():
     """設定ページ"""
     return render_template('settings.html')
+
+def _send_board(fmt, version=None):
+    """
+    事前生成した天気ボードを配信
+
+    版の指定が無いURLは現在の版を毎回検証させ（ETagで304）、
+    版付きURLは内容が変わらないため長期キャッシュさせる。
+    """
+    manifest = board_snapshots.current()
+    if manifest is None:
+        abort(404)
+    path = board_snapshots.artifact_path(version or manifest['version'], fmt)
+    encoding = None
+    if request.accept_encodings.best_match(['gzip']) and os.path.exists(f"{path}.gz"):
+        encoding = 'gzip'
+        path = f"{path}.gz"
+    if not os.path.exists(path):
+        abort(404)
+
+    response = send_file(
+        path, mimetype=BOARD_FORMATS[fmt], conditional=True,
+        etag=f"{version or manifest['version']}-{fmt}-{encoding or 'identity'}"
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if version else 'no-cache'
+    return response
+
+@main_bp.route('/board')
+def board():
+    """明日の天気ボード（HTML）"""
+    return _send_board('html')
+
+@main_bp.route('/board.<any(json, csv):fmt>')
+def board_data(fmt):
+    """明日の天気ボード（JSON / CSV）"""
+    return _send_board(fmt)
+
+@main_bp.route('/board/<version>.<any(json, csv, html):fmt>')
+def board_version(version, fmt):
+    """版を指定した天気ボード"""
+    if not version.isalnum():
+        abort(404)
+    return _send_board(fmt, version)
@@ -0,0 +1,285 @@
+"""
+リクエストプロファイリング
+"""
+from flask import Blueprint, current_app, g, has_request_context, jsonify, request, send_file, abort
+from sqlalchemy import event
+from datetime import datetime
+from typing import Dict, List, Optional
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+# 強制的にプロファイルを取るリクエストヘッダー
+PROFILE_HEADER = 'X-Profile'
+
+# 保存するプロファイルIDの形式（パストラバーサル防止）
+PROFILE_ID_PATTERN = re.compile(r'^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$')
+
+# 1リクエストあたりに記録するSQLの上限
+MAX_SQL_STATEMENTS = 200
+
+# ADMIN_TOKEN 未設定時に管理APIを許可する接続元
+LOCAL_ADDRS = ('127.0.0.1', '::1')
+
+
+class RequestProfiler:
+    """
+    サンプリングしたリクエストの cProfile と SQL を記録する
+
+    PROFILING_ENABLED が False の場合はフックを一切登録しないため、
+    無効時のオーバーヘッドは無い。有効時は PROFILING_SAMPLE_RATE の確率、
+    または X-Profile ヘッダー付きのリクエストのみ計測し、
+    PROFILING_SLOW_MS 以上かかったもの（ヘッダー指定時は常に）を
+    PROFILING_MAX_PROFILES 件のリングとしてディスクに保存する。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.sample_rate = 0.0
+        self.slow_ms = 500
+        self.max_profiles = 50
+        self.header_token = ''
+        # cProfile は同時に1つしか有効にできないため計測中のリクエストは1件に限る
+        self._profile_lock = threading.Lock()
+        self._ring_lock = threading.Lock()
+
+    def init_app(self, app, engine=None):
+        """有効な場合のみリクエストフックとSQLイベントを登録"""
+        self.enabled = app.config.get('PROFILING_ENABLED', False)
+        if not self.enabled:
+            return
+        self.directory = app.config.get('PROFILING_DIR') or os.path.join(app.root_path, 'data', 'profiles')
+        self.sample_rate = app.config.get('PROFILING_SAMPLE_RATE', self.sample_rate)
+        self.slow_ms = app.config.get('PROFILING_SLOW_MS', self.slow_ms)
+        self.max_profiles = app.config.get('PROFILING_MAX_PROFILES', self.max_profiles)
+        self.header_token = app.config.get('ADMIN_TOKEN', '')
+        os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+        if engine is not None:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        logger.info(f"リクエストプロファイリングを有効化しました: {self.directory}")
+
+    def list_profiles(self) -> List[Dict]:
+        """保存済みプロファイルの概要を新しい順に取得"""
+        profiles = []
+        for profile_id in sorted(self._profile_ids(), reverse=True):
+            meta = self.load_meta(profile_id)
+            if meta:
+                meta.pop('sql', None)
+                meta.pop('top_functions', None)
+                profiles.append(meta)
+        return profiles
+
+    def load_meta(self, profile_id: str) -> Optional[Dict]:
+        """プロファイルの詳細（SQL・上位関数を含む）を取得"""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, '.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats_path(self, profile_id: str) -> Optional[str]:
+        """pstats形式ファイルのパス"""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = self._path(profile_id, '.prof')
+        return path if os.path.exists(path) else None
+
+    def _should_profile(self) -> bool:
+        header = request.headers.get(PROFILE_HEADER)
+        if header is not None:
+            # 管理APIと同じく、トークン設定時は一致した場合、未設定時はローカルからのみ受け付ける
+            if self.header_token:
+                return header == self.header_token
+            return request.remote_addr in LOCAL_ADDRS
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start(self):
+        if not self._should_profile():
+            return
+        g._profile_forced = PROFILE_HEADER in request.headers
+        g._profile_sql = []
+        g._profile_started = time.perf_counter()
+        if self._profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # 他のプロファイラが有効な場合はSQLと所要時間のみ記録
+                self._profile_lock.release()
+                return
+            g._profiler = profiler
+
+    def _finish(self, exc=None):
+        started = g.pop('_profile_started', None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            self._profile_lock.release()
+        sql = g.pop('_profile_sql', [])
+        forced = g.pop('_profile_forced', False)
+        if elapsed_ms < self.slow_ms and not forced:
+            return
+        try:
+            self._save(profiler, sql, elapsed_ms, exc)
+        except Exception as e:
+            logger.error(f"プロファイル保存エラー: {e}")
+
+    def _save(self, profiler: Optional[cProfile.Profile], sql: List[Dict], elapsed_ms: float, exc):
+        profile_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+        top_functions = []
+        if profiler is not None:
+            profiler.dump_stats(self._path(profile_id, '.prof'))
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(30)
+            top_functions = output.getvalue().splitlines()
+
+        meta = {
+            'id': profile_id,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'elapsed_ms': round(elapsed_ms, 2),
+            'error': str(exc) if exc else None,
+            'sql_count': len(sql),
+            'sql_ms': round(sum(item['ms'] for item in sql), 2),
+            'has_stats': profiler is not None,
+            'created_at': datetime.utcnow().isoformat(),
+            'sql': sql,
+            'top_functions': top_functions
+        }
+        with open(self._path(profile_id, '.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._trim()
+        logger.info(f"プロファイルを保存しました: {meta['path']} {meta['elapsed_ms']}ms -> {profile_id}")
+
+    def _trim(self):
+        """古いプロファイルを削除して上限件数に保つ"""
+        with self._ring_lock:
+            ids = sorted(self._profile_ids())
+            for profile_id in ids[:max(0, len(ids) - self.max_profiles)]:
+                for suffix in ('.json', '.prof'):
+                    try:
+                        os.remove(self._path(profile_id, suffix))
+                    except OSError:
+                        pass
+
+    def _profile_ids(self) -> List[str]:
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        return [
+            name[:-5] for name in os.listdir(self.directory)
+            if name.endswith('.json') and PROFILE_ID_PATTERN.match(name[:-5])
+        ]
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}{suffix}")
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and g.get('_profile_sql') is not None:
+            conn.info.setdefault('_profile_query_start', []).append(time.perf_counter())
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context():
+            return
+        sql = g.get('_profile_sql')
+        starts = conn.info.get('_profile_query_start')
+        if sql is None or not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+        if len(sql) < MAX_SQL_STATEMENTS:
+            sql.append({'statement': statement, 'ms': round(elapsed_ms, 3), 'executemany': executemany})
+
+
+profiler = RequestProfiler()
+
+
+def _require_admin():
+    """管理APIへのアクセスを制限（トークン未設定時はローカルのみ）"""
+    token = current_app.config.get('ADMIN_TOKEN', '')
+    if token:
+        if request.headers.get('X-Admin-Token') != token:
+            abort(403)
+    elif request.remote_addr not in LOCAL_ADDRS:
+        abort(403)
+
+
+def admin_required(view):
+    """管理用エンドポイントに _require_admin と同じ制限をかけるデコレーター"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        _require_admin()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@admin_bp.before_request
+def check_admin_access():
+    """管理APIの共通チェック"""
+    _require_admin()
+    if not profiler.enabled:
+        return jsonify({
+            'status': 'error',
+            'message': 'プロファイリングは無効です（PROFILING_ENABLED）'
+        }), 404
+
+
+@admin_bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    """保存済みプロファイルの一覧"""
+    return jsonify({
+        'status': 'success',
+        'data': profiler.list_profiles()
+    }), 200
+
+
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """プロファイルの詳細（SQLと上位関数）"""
+    meta = profiler.load_meta(profile_id)
+    if not meta:
+        return jsonify({
+            'status': 'error',
+            'message': 'プロファイルが見つかりません'
+        }), 404
+    return jsonify({
+        'status': 'success',
+        'data': meta
+    }), 200
+
+
+@admin_bp.route('/profiles/<profile_id>/download', methods=['GET'])
+def download_profile(profile_id):
+    """pstats形式ファイルをダウンロード（snakeviz等で閲覧可能）"""
+    path = profiler.stats_path(profile_id)
+    if not path:
+        return jsonify({
+            'status': 'error',
+            'message': 'プロファイルが見つかりません'
+        }), 404
+    return send_file(path, mimetype='application/octet-stream',
+                     as_attachment=True, download_name=f"{profile_id}.prof")